@@ -0,0 +1,239 @@
+#!/usr/bin/env python
+"""Benchmarks of the engine, rendering and broadcast hot paths.
+
+    python benchmarks/run_benchmarks.py                       # writes benchmarks/results/<commit>.json
+    python benchmarks/run_benchmarks.py --compare old.json    # and prints the change against an older run
+
+Every benchmark plays seeded games between the fish and random sample
+players, so two runs on the same commit do the same work.
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import subprocess
+from collections import OrderedDict
+
+import numpy as np
+
+root = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.append(root)
+
+import pypokergui.ai_generator as AG
+import pypokergui.hand_evaluator as HE
+import pypokergui.engine_wrapper as Engine
+import pypokergui.server.game_manager as GM
+import pypokergui.server.message_manager as MM
+import pypokergui.server.delivery_scheduler as DS
+import pypokergui.server.shared_frame as SF
+
+SAMPLE_PLAYERS = [
+    ("fish1", os.path.join(root, "sample_player", "fish_player_setup.py")),
+    ("random1", os.path.join(root, "sample_player", "random_player_setup.py")),
+    ("fish2", os.path.join(root, "sample_player", "fish_player_setup.py")),
+    ("random2", os.path.join(root, "sample_player", "random_player_setup.py")),
+]
+
+CONFIG = {
+    "max_round": 10,
+    "initial_stack": 100,
+    "small_blind": 5,
+    "ante": 0,
+    "blind_structure": None,
+    "ai_players": [{"name": name, "path": path} for name, path in SAMPLE_PLAYERS],
+}
+
+
+def bench_engine(games, seed, in_place=False):
+    """EngineWrapper.update_game steps/sec and complete games/sec"""
+    random.seed(seed)
+    players = OrderedDict((str(idx), AG.setup_player(path)) for idx, (_name, path) in enumerate(SAMPLE_PLAYERS))
+    players_info = Engine.gen_players_info(list(players.keys()), [name for name, _path in SAMPLE_PLAYERS])
+    game_config = Engine.gen_game_config(CONFIG["max_round"], CONFIG["initial_stack"], CONFIG["small_blind"], CONFIG["ante"])
+    step_count, step_time = 0, 0.0
+    start_time = time.perf_counter()
+    for _ in range(games):
+        engine = Engine.EngineWrapper(in_place)
+        messages = engine.start_game(players_info, game_config)
+        while not GM.has_game_finished(messages):
+            uuid, ask = messages[-1]
+            ask = ask["message"]
+            action, amount = players[uuid].declare_action(ask["valid_actions"], ask["hole_card"], ask["round_state"])
+            step_start = time.perf_counter()
+            messages = engine.update_game(action, amount)
+            step_time += time.perf_counter() - step_start
+            step_count += 1
+    elapsed = time.perf_counter() - start_time
+    return {
+        "games": games,
+        "steps": step_count,
+        "steps_per_sec": step_count / step_time,
+        "games_per_sec": games / elapsed,
+    }
+
+
+def bench_hand_evaluator(hand_count, seed):
+    """7 card evaluations/sec of hand_evaluator, one by one and batched"""
+    rng = random.Random(seed)
+    hands = [rng.sample(range(52), 7) for _ in range(hand_count)]
+    HE.evaluate(hands[0])  # build the tables outside of the timing
+    start_time = time.perf_counter()
+    for hand in hands: HE.evaluate(hand)
+    scalar_time = time.perf_counter() - start_time
+    hands = np.array(hands)
+    start_time = time.perf_counter()
+    HE.evaluate_batch(hands)
+    batch_time = time.perf_counter() - start_time
+    return {
+        "hands": hand_count,
+        "evals_per_sec": hand_count / scalar_time,
+        "batch_evals_per_sec": hand_count / batch_time,
+    }
+
+
+def bench_update_message(games, seed):
+    """_gen_game_update_message time per message type"""
+    timings = {}
+    for game_manager in _played_games(games, seed):
+        for destination, update in game_manager.latest_messages:
+            if 'hole_card' in update['message']:
+                game_manager.record_hole_card(str(destination), update['message']['hole_card'])
+            message_type = update['message']['message_type']
+            start_time = time.perf_counter()
+            MM._gen_game_update_message(update, game_manager)
+            timings.setdefault(message_type, []).append(time.perf_counter() - start_time)
+    return OrderedDict((message_type, _summarize(samples)) for message_type, samples in sorted(timings.items()))
+
+
+def bench_broadcast(games, seed, socket_counts):
+    """broadcast_update_game fan-out time per update with N fake sockets"""
+    result = OrderedDict()
+    for socket_count in socket_counts:
+        sockets = OrderedDict()
+        for idx in range(socket_count):
+            socket = FakeSocket("spectator-%04d" % idx)
+            sockets[socket.uuid] = socket
+        scheduler = DS.DeliveryScheduler()
+        samples = []
+        for game_manager in _played_games(games, seed):
+            start_time = time.perf_counter()
+            MM.broadcast_update_game(game_manager, sockets, scheduler, "dev")
+            samples.append(time.perf_counter() - start_time)
+        summary = _summarize(samples)
+        summary["bytes_per_socket"] = sum([s.sent_bytes for s in sockets.values()]) / socket_count
+        result[str(socket_count)] = summary
+    return result
+
+
+class FakeSocket(object):
+
+    def __init__(self, uuid):
+        self.uuid = uuid
+        self.sent_bytes = 0
+
+    def write_message(self, message):
+        # deflated as a socket which negotiated permessage-deflate would
+        if isinstance(message, SF.SharedFrame) and len(message) >= 256:
+            self.sent_bytes += len(message.deflate(15, 6))
+        else:
+            self.sent_bytes += len(message)
+
+    def send_frame(self, frame, round_state=None, droppable=True):
+        self.write_message(frame)
+
+
+def _played_games(games, seed):
+    """Yield the game manager after every engine step of seeded games"""
+    random.seed(seed)
+    for _ in range(games):
+        game_manager = GM.setup_game_manager(CONFIG)
+        game_manager.start_game()
+        GM.broadcast_game_start_to_ai(game_manager)
+        yield game_manager
+        while not GM.has_game_finished(game_manager.latest_messages):
+            action, amount = game_manager.ask_action_to_ai_player(game_manager.next_player_uuid)
+            game_manager.update_game(action, amount)
+            yield game_manager
+
+
+def _summarize(samples):
+    samples = sorted(samples)
+    return {
+        "count": len(samples),
+        "mean_us": sum(samples) / len(samples) * 1e6,
+        "p50_us": samples[len(samples) // 2] * 1e6,
+        "p99_us": samples[min(len(samples) - 1, int(len(samples) * 0.99))] * 1e6,
+    }
+
+
+def run_benchmarks(games, seed, socket_counts):
+    return OrderedDict([
+        ("meta", _gen_meta(games, seed)),
+        ("engine", bench_engine(games, seed)),
+        ("engine_in_place", bench_engine(games, seed, in_place=True)),
+        ("hand_evaluator", bench_hand_evaluator(games * 500, seed)),
+        ("update_message", bench_update_message(games, seed)),
+        ("broadcast", bench_broadcast(max(1, games // 10), seed, socket_counts)),
+    ])
+
+
+def compare(current, baseline, path=""):
+    """Print the relative change of every number found in both results"""
+    for key, value in current.items():
+        if key == "meta" or key not in baseline: continue
+        name = "%s.%s" % (path, key) if path else key
+        if isinstance(value, dict):
+            compare(value, baseline[key], name)
+        elif isinstance(value, (int, float)) and baseline[key]:
+            change = (value - baseline[key]) / baseline[key] * 100
+            print("%-50s %14.2f %14.2f %+8.1f%%" % (name, baseline[key], value, change))
+
+
+def _gen_meta(games, seed):
+    return {
+        "commit": _git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "games": games,
+        "seed": seed,
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=root, stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="PyPokerGUI benchmarks")
+    parser.add_argument("-n", "--games", type=int, default=200, help="Number of games per benchmark")
+    parser.add_argument("--seed", type=int, default=1, help="Random seed of the played games")
+    parser.add_argument("--sockets", type=int, nargs="+", default=[1, 10, 100], help="Fake socket counts for the broadcast benchmark")
+    parser.add_argument("-o", "--output", default=None, help="Result path (default: benchmarks/results/<commit>.json)")
+    parser.add_argument("--compare", default=None, help="Earlier result to compare against")
+    args = parser.parse_args()
+
+    result = run_benchmarks(args.games, args.seed, args.sockets)
+    output = args.output or os.path.join(root, "benchmarks", "results", "%s.json" % result["meta"]["commit"])
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(result, f, indent=2)
+    print(json.dumps(result, indent=2))
+    print("saved to %s" % output)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        print("%-50s %14s %14s %9s" % ("metric", baseline["meta"]["commit"], result["meta"]["commit"], "change"))
+        compare(result, baseline)
+
+
+if __name__ == "__main__":
+    main()
@@ -14,20 +14,39 @@ sys.path.append(src)
 
 from pypokergui.server.poker import start_server
 from pypokergui.config_builder import build_config
+from pypokergui.simulator import run_simulation, format_simulation_report, run_duplicate_simulation, format_duplicate_report
+from pypokergui.preflop import build_preflop_table
+from pypokergui.server.replay import start_replay_server
 
-def serve(config_path, port, speed):
+def load_config(config_path):
+    with open(config_path, "r", encoding="utf-8", errors="ignore") as f:
+        raw_data = f.read()
+        clean_data = raw_data.replace("\x00", "")  # null characters in string form
+        return yaml.safe_load(clean_data)
+
+def serve(config_path, port, speed, production, record_path):
     host = "localhost"
 
     # Open browser
     webbrowser.open(f"http://{host}:{port}")
 
     # Load YAML config
-    with open(config_path, "r", encoding="utf-8", errors="ignore") as f:
-        raw_data = f.read()
-        clean_data = raw_data.replace("\x00", "")  # null characters in string form
-        config = yaml.safe_load(clean_data)
+    config = load_config(config_path)
 
-    start_server(config_path, port, speed)
+    start_server(config_path, port, speed, production, record_path)
+
+def replay(log_path, port, speed):
+    webbrowser.open(f"http://localhost:{port}")
+    start_replay_server(log_path, port, speed)
+
+def simulate(config_path, games, workers, seed, record_path, duplicate):
+    config = load_config(config_path)
+    if duplicate:
+        report = run_duplicate_simulation(config, games, workers, seed, record_path)
+        print(format_duplicate_report(report))
+    else:
+        report = run_simulation(config, games, workers, seed, record_path)
+        print(format_simulation_report(report))
 
 def main():
     parser = argparse.ArgumentParser(description="PyPokerGUI CLI (no click)")
@@ -38,6 +57,30 @@ def main():
     serve_parser.add_argument("config", help="Path to config YAML file")
     serve_parser.add_argument("--port", type=int, default=8000, help="Port to run server on")
     serve_parser.add_argument("--speed", choices=["dev", "slow", "moderate", "fast"], default="moderate", help="Game speed")
+    serve_parser.add_argument("--production", action="store_true", help="Compile templates once and turn off debug mode")
+    serve_parser.add_argument("--record", default=None, help="Append the history of every hand to this log")
+
+    # Simulate command
+    simulate_parser = subparsers.add_parser("simulate", help="Run games between AI players without the GUI")
+    simulate_parser.add_argument("config", help="Path to config YAML file")
+    simulate_parser.add_argument("-n", "--games", type=int, default=100, help="Number of games to play")
+    simulate_parser.add_argument("-w", "--workers", type=int, default=1, help="Number of worker processes")
+    simulate_parser.add_argument("--seed", type=int, default=None, help="Base random seed (game i uses seed + i)")
+    simulate_parser.add_argument("--record", default=None, help="Append the history of every hand to this log")
+    simulate_parser.add_argument("--duplicate", action="store_true", help="Play each seeded deal once per seat rotation (-n counts deals)")
+
+    # Replay command
+    replay_parser = subparsers.add_parser("replay", help="Replay recorded hand histories in the GUI")
+    replay_parser.add_argument("log", help="Path to a hand history log written with --record")
+    replay_parser.add_argument("--port", type=int, default=8000, help="Port to run server on")
+    replay_parser.add_argument("--speed", choices=["dev", "slow", "moderate", "fast"], default="moderate", help="Replay speed at x1")
+
+    # Build preflop table command
+    preflop_parser = subparsers.add_parser("build_preflop_table", help="Precompute preflop equities of all starting hands")
+    preflop_parser.add_argument("-o", "--output", default=None, help="Table path (default: pypokergui/data/preflop_table.bin)")
+    preflop_parser.add_argument("-r", "--runouts", type=int, default=20000, help="Simulated runouts per hand and opponent count")
+    preflop_parser.add_argument("-w", "--workers", type=int, default=1, help="Number of worker processes")
+    preflop_parser.add_argument("--seed", type=int, default=None, help="Random seed")
 
     # Build config command
     build_parser = subparsers.add_parser("build_config", help="Build a new poker config YAML")
@@ -49,7 +92,13 @@ def main():
     args = parser.parse_args()
 
     if args.command == "serve":
-        serve(args.config, args.port, args.speed)
+        serve(args.config, args.port, args.speed, args.production, args.record)
+    elif args.command == "simulate":
+        simulate(args.config, args.games, args.workers, args.seed, args.record, args.duplicate)
+    elif args.command == "replay":
+        replay(args.log, args.port, args.speed)
+    elif args.command == "build_preflop_table":
+        build_preflop_table(args.output, args.runouts, args.workers, args.seed)
     elif args.command == "build_config":
         build_config(args.maxround, args.stack, args.small_blind, args.ante, None)
     else:
@@ -1,6 +1,8 @@
 import os
 import sys
-import importlib
+import time
+import hashlib
+import importlib.util
 
 from pypokerengine.players import BasePokerPlayer
 
@@ -9,34 +11,76 @@ from pypokerengine.players import BasePokerPlayer
     returns child instance of pypokerengine.players.BasePokerPlayer.
 """
 def healthcheck(script_path, quiet=False):
-    status = True
+    try:
+        setup_player(script_path)
+    except Exception as e:
+        if not quiet: print(e)
+        return False
+    if not quiet: print("health check succeeded for script of [ %s ]" % script_path)
+    return True
+
+def setup_player(script_path, timings=None):
+    """Build the player of the script, raising when the script does not satisfy the requirements.
+    Seconds spent to import the script, to run setup_ai and to run the
+    optional warm_up() method of the player are stored in timings.
+    """
+    timings = {} if timings is None else timings
 
     # Assertion-1. check if setup_ai method is implemented
+    start_time = time.time()
     try:
-        setup_method = _import_setup_method(script_path)
+        setup_method = load_setup_method(script_path)
     except Exception as e:
-        if not quiet: print('"setup_ai" method was not found in [ %s ].(Exception=%s)' % (script_path, e.message))
-        status = False
+        raise Exception('"setup_ai" method was not found in [ %s ].(Exception=%s)' % (script_path, e))
+    timings["import"] = time.time() - start_time
 
     # Assertion-2. check if "setup_ai" method works
+    start_time = time.time()
     try:
-        if status: player = setup_method()
+        player = setup_method()
     except Exception as e:
-        if not quiet: print('Exception [ %s ] was raised when your "setup_ai" method invoked' % e.message)
-        status = False
+        raise Exception('Exception [ %s ] was raised when your "setup_ai" method invoked' % e)
+    timings["init"] = time.time() - start_time
 
     # Assertion-3. check if generated player is instance of BasePokerPlayer
-    if status and not isinstance(player, BasePokerPlayer):
-        if not quiet: print("Generated player is not instance of [ BasePokerPlayer ] but of [ %s ]" % type(player).__name__)
-        status = False
+    if not isinstance(player, BasePokerPlayer):
+        raise Exception("Generated player is not instance of [ BasePokerPlayer ] but of [ %s ]" % type(player).__name__)
+
+    # players may load their models or tables in warm_up(), before the game starts
+    start_time = time.time()
+    warm_up = getattr(player, "warm_up", None)
+    if callable(warm_up):
+        try:
+            warm_up()
+        except Exception as e:
+            raise Exception('Exception [ %s ] was raised when your "warm_up" method invoked' % e)
+    timings["warm_up"] = time.time() - start_time
+
+    return player
 
-    if status and not quiet: print("health check succeeded for script of [ %s ]" % script_path)
-    return status
+def load_setup_method(script_path):
+    # Each script is imported once, under a module name derived from its
+    # absolute path, so two bots named mybot.py in different folders never
+    # share a module and a script used by several seats is imported once.
+    path = os.path.abspath(script_path)
+    if path not in _setup_methods:
+        stem = os.path.splitext(os.path.basename(path))[0]
+        module_name = "pypokergui_ai_%s_%s" % (stem, hashlib.sha1(path.encode("utf-8")).hexdigest()[:10])
+        spec = importlib.util.spec_from_file_location(module_name, path)
+        if spec is None:
+            raise ImportError("[ %s ] is not a python script" % script_path)
+        # the folder of the script stays importable for its helper modules
+        dirname = os.path.dirname(path)
+        if dirname not in sys.path: sys.path.append(dirname)
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[module_name] = module
+        try:
+            spec.loader.exec_module(module)
+        except:
+            del sys.modules[module_name]
+            raise
+        _setup_methods[path] = module.setup_ai
+    return _setup_methods[path]
 
-def _import_setup_method(script_path):
-    dirname = os.path.dirname(script_path)
-    filename = os.path.basename(script_path)
-    sys.path.append(dirname)
-    m = importlib.import_module(os.path.splitext(filename)[0])
-    return m.setup_ai
 
+_setup_methods = {}  # absolute script path => setup_ai
@@ -1,12 +1,39 @@
 from collections import OrderedDict
 
+from pypokerengine.engine.deck import Deck
 from pypokerengine.engine.table import Table
 from pypokerengine.engine.player import Player
 from pypokerengine.engine.round_manager import RoundManager
+from pypokerengine.engine.game_evaluator import GameEvaluator
 from pypokerengine.engine.message_builder import MessageBuilder
 from pypokerengine.engine.poker_constants import PokerConstants as Const
 
+import pypokergui.hand_evaluator as HE
+
 class EngineWrapper(object):
+    """Drive a game of pypokerengine one action at a time.
+
+    By default RoundManager deep-copies the whole table on every action.
+    With in_place=True, actions are applied to current_state directly and
+    the actions of the current round are logged after a serialized copy of
+    the round start, which is enough to undo them. Independent copies of
+    the state are made only when snapshot() is called.
+
+    With fast_showdown=True, showdowns are judged by the table based
+    pypokergui.hand_evaluator, which applies full kicker rules, instead of
+    pypokerengine's HandEvaluator.
+
+    With a deck_source, every round is dealt from deck_source(round_count),
+    a list of the 52 card ids in dealing order, instead of a shuffled deck.
+    """
+
+    def __init__(self, in_place=False, fast_showdown=False, deck_source=None):
+        self.in_place = in_place
+        self.fast_showdown = fast_showdown
+        self.deck_source = deck_source
+        self.round_manager = ROUND_MANAGERS[(in_place, fast_showdown)]
+        self.round_start_snapshot = None
+        self.action_log = []  # (action, bet_amount) applied in the current round
 
     def start_game(self, players_info, game_config):
         self.config = game_config
@@ -21,7 +48,8 @@ class EngineWrapper(object):
         return _parse_broadcast_destination(msgs, self.current_state['table'])
 
     def update_game(self, action, bet_amount):
-        state, msgs = RoundManager.apply_action(self.current_state, action, bet_amount)
+        state, msgs = self.round_manager.apply_action(self.current_state, action, bet_amount)
+        if self.in_place: self.action_log.append((action, bet_amount))
         if state['street'] == Const.Street.FINISHED:
             state, new_msgs = self._start_next_round(
                     state['round_count']+1, self.config['blind_structure'], state['table'])
@@ -29,6 +57,20 @@ class EngineWrapper(object):
         self.current_state = state
         return _parse_broadcast_destination(msgs, self.current_state['table'])
 
+    def snapshot(self):
+        """Copy of current_state which is not touched by later actions"""
+        return _copy_state(self.current_state)
+
+    def undo(self):
+        """Revert the last action of the current round (in_place mode only)"""
+        assert self.in_place and self.action_log
+        actions = self.action_log[:-1]
+        state = _copy_state(self.round_start_snapshot)
+        for action, bet_amount in actions:
+            state, _msgs = self.round_manager.apply_action(state, action, bet_amount)
+        self.current_state = state
+        self.action_log = actions
+
     def _start_new_round(self, round_count, blind_structure, table):
         # adjust btn position to put btn of player-0 after table.shift_dealer_btn()
         # which will be called in self._start_next_round(...)
@@ -45,7 +87,14 @@ class EngineWrapper(object):
             msgs = _parse_broadcast_destination([game_result_msg], table)
             return finished_state, msgs
         else:
-            return RoundManager.start_new_round(round_count, small_blind, ante, table)
+            if self.deck_source:
+                # a cheat deck is dealt in the given order as start_new_round skips its shuffle
+                table.deck = Deck(cheat=True, cheat_card_ids=self.deck_source(round_count))
+            state, msgs = self.round_manager.start_new_round(round_count, small_blind, ante, table)
+            if self.in_place:
+                self.round_start_snapshot = _copy_state(state)
+                self.action_log = []
+            return state, msgs
 
     def _has_game_finished(self, round_count, table, max_round):
         is_final_round = round_count == max_round
@@ -53,6 +102,49 @@ class EngineWrapper(object):
         return is_final_round or is_winner_decided
 
 
+class InPlaceRoundManager(RoundManager):
+    """RoundManager which updates the given state instead of a copy of it"""
+
+    @classmethod
+    def _RoundManager__deep_copy_state(self, state):
+        # name mangled override of RoundManager.__deep_copy_state
+        return state
+
+
+class FastShowdownRoundManager(RoundManager):
+    """RoundManager which judges showdowns with FastGameEvaluator"""
+
+    @classmethod
+    def _RoundManager__showdown(self, state):
+        winners, hand_info, prize_map = FastGameEvaluator.judge(state["table"])
+        self._RoundManager__prize_to_winners(state["table"].seats.players, prize_map)
+        result_message = MessageBuilder.build_round_result_message(state["round_count"], winners, hand_info, state)
+        state["table"].reset()
+        state["street"] += 1
+        return state, [(-1, result_message)]
+
+
+class InPlaceFastShowdownRoundManager(InPlaceRoundManager, FastShowdownRoundManager):
+    pass
+
+
+class FastGameEvaluator(GameEvaluator):
+    """GameEvaluator which scores hands with pypokergui.hand_evaluator"""
+
+    @classmethod
+    def _GameEvaluator__find_winners_from(self, community_card, players):
+        active_players = [player for player in players if player.is_active()]
+        scores = [_eval_player_hand(player, community_card) for player in active_players]
+        best_score = max(scores)
+        return [player for score, player in zip(scores, active_players) if score == best_score]
+
+    @classmethod
+    def _GameEvaluator__gen_hand_info_if_needed(self, players, community):
+        active_players = [player for player in players if player.is_active()]
+        if len(active_players) == 1: return []
+        return [{ "uuid": player.uuid, "hand": _gen_hand_rank_info(player, community) } for player in active_players]
+
+
 def gen_players_info(uuid_list, name_list):
     assert len(uuid_list) == len(name_list)
     return OrderedDict(zip(uuid_list, name_list))
@@ -133,6 +225,30 @@ def _parse_broadcast_destination(messages, table):
         #    parsed_msgs.append(message)
     return parsed_msgs
 
+def _eval_player_hand(player, community_card):
+    return HE.evaluate(HE.parse_cards([str(card) for card in player.hole_card + community_card]))
+
+def _gen_hand_rank_info(player, community_card):
+    # same layout as pypokerengine's HandEvaluator.gen_hand_rank_info
+    value = _eval_player_hand(player, community_card)
+    hole_ranks = sorted([card.rank for card in player.hole_card])
+    hand_ranks = HE.hand_ranks(value)
+    if HE.hand_strength(value) == "HIGHCARD":
+        hand_high, hand_low = hole_ranks[1], hole_ranks[0]
+    elif HE.hand_strength(value) in ["TWOPAIR", "FULLHOUSE"]:
+        hand_high, hand_low = hand_ranks[0], hand_ranks[1]
+    else:
+        hand_high, hand_low = hand_ranks[0], 0
+    return {
+            "hand": { "strength": HE.hand_strength(value), "high": hand_high, "low": hand_low },
+            "hole": { "high": hole_ranks[1], "low": hole_ranks[0] }
+            }
+
+def _copy_state(state):
+    copied = dict(state)
+    copied['table'] = Table.deserialize(state['table'].serialize())
+    return copied
+
 def _gen_game_result_message(table, config):
     compat_config = {
             'initial_stack': config['initial_stack'],
@@ -145,3 +261,9 @@ def _gen_game_result_message(table, config):
     destination = -1
     return (destination, msg)
 
+ROUND_MANAGERS = {
+        (False, False): RoundManager,
+        (True, False): InPlaceRoundManager,
+        (False, True): FastShowdownRoundManager,
+        (True, True): InPlaceFastShowdownRoundManager
+        }
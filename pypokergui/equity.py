@@ -0,0 +1,80 @@
+import time
+import statistics
+
+import numpy as np
+
+import pypokergui.hand_evaluator as HE
+
+"""Estimate the equity of a hand by simulating random runouts.
+    Bots can pass the hole_card and round_state['community_card'] they
+    receive as they are:
+
+      import pypokergui.equity as EQ
+      result = EQ.estimate_equity(hole_card, round_state['community_card'], opponents=3, time_budget=0.02)
+      if result["low"] > 0.5: ...
+
+    Runouts are simulated in batches. For each runout, the missing board
+    cards and the opponents' hole cards are drawn from the rest of the deck,
+    and all the hands are scored with hand_evaluator.evaluate_batch. A win
+    scores 1, a split pot with k other players scores 1 / (k + 1) and a loss
+    scores 0. Batches stop when the time budget runs out or the half-width
+    of the confidence interval (low and high are equity -/+ that error,
+    clipped to [0, 1]) is at most target_error. The first call also builds the
+    hand_evaluator tables, so make one call in setup_ai to pay that up front.
+"""
+def estimate_equity(hole_card, community_card=(), opponents=1, time_budget=0.01,
+        target_error=None, confidence=0.95, batch_size=2000, rng=None):
+    assert len(hole_card) == 2 and len(community_card) <= 5 and opponents >= 1
+    hole = np.array(_parse(hole_card), dtype=np.int64)
+    board = np.array(_parse(community_card), dtype=np.int64)
+    rng = rng or _default_rng
+    deck = np.setdiff1d(np.arange(52), np.concatenate([hole, board]))
+    assert 5 - len(board) + 2 * opponents <= len(deck)
+    z = statistics.NormalDist().inv_cdf(0.5 + confidence / 2)
+
+    deadline = time.perf_counter() + time_budget
+    samples, total, total_square = 0, 0.0, 0.0
+    while True:
+        scores = simulate_runouts(hole, board, opponents, deck, batch_size, rng)
+        samples += len(scores)
+        total += float(scores.sum())
+        total_square += float(np.square(scores).sum())
+        equity = total / samples
+        error = z * (max(0.0, total_square / samples - equity ** 2) / samples) ** 0.5
+        if time.perf_counter() >= deadline: break
+        if target_error is not None and error <= target_error: break
+    return {
+            "equity": equity,
+            "low": max(0.0, equity - error),
+            "high": min(1.0, equity + error),
+            "samples": samples
+            }
+
+def simulate_runouts(hole, board, opponents, deck, runout_count, rng):
+    """Score of the hole cards (1 win, 1/(k+1) split, 0 loss) in each random runout"""
+    missing_board = 5 - len(board)
+    draw_count = missing_board + 2 * opponents
+    # the first draw_count columns of a random permutation of the deck per row
+    drawn = deck[np.argsort(rng.random((runout_count, len(deck))), axis=1)[:, :draw_count]]
+    boards = np.concatenate([np.tile(board, (runout_count, 1)), drawn[:, :missing_board]], axis=1)
+    my_values = HE.evaluate_batch(np.concatenate([np.tile(hole, (runout_count, 1)), boards], axis=1))
+    best_values = np.full(runout_count, -1, dtype=np.int64)
+    best_counts = np.zeros(runout_count, dtype=np.int64)
+    for idx in range(opponents):
+        opponent_hole = drawn[:, missing_board + 2 * idx:missing_board + 2 * idx + 2]
+        values = HE.evaluate_batch(np.concatenate([opponent_hole, boards], axis=1))
+        best_counts = np.where(values > best_values, 1, best_counts + (values == best_values))
+        best_values = np.maximum(values, best_values)
+    return np.where(my_values > best_values, 1.0,
+            np.where(my_values == best_values, 1.0 / (best_counts + 1), 0.0))
+
+def seed(value):
+    """Reseed the generator which is used when no rng is passed"""
+    global _default_rng
+    _default_rng = np.random.default_rng(value)
+
+def _parse(cards):
+    return [HE.parse_card(card) if isinstance(card, str) else card for card in cards]
+
+
+_default_rng = np.random.default_rng()
@@ -0,0 +1,148 @@
+import itertools
+
+import numpy as np
+
+"""Evaluate poker hands of 5 to 7 cards with precomputed rank tables.
+    Cards are encoded as ints (rank_index * 4 + suit_index), where
+    rank_index is 0..12 for "2".."A" and suit_index is 0..3 for "C","D","H","S".
+    Use parse_card / parse_cards to convert the strings bots receive ("SA").
+
+    A hand value is (category << 20) | the ranks deciding ties (4 bits each,
+    most significant first), so a larger value is a stronger hand and equal
+    values split the pot. Categories follow pypokerengine's naming, see
+    hand_strength().
+
+    Hands without a flush are looked up by their multiset of ranks (each rank
+    adds 5**rank_index to the key), flushes by the 13 bit rank mask of their
+    suit. evaluate() looks up a single hand and evaluate_batch() looks up a
+    whole (N, cards) array of hands at once with NumPy.
+"""
+def parse_card(card_str):
+    return RANKS.index(card_str[1].upper()) * 4 + SUITS.index(card_str[0].upper())
+
+def parse_cards(card_strs):
+    return [parse_card(card_str) for card_str in card_strs]
+
+def card_to_str(card):
+    return SUITS[card & 3] + RANKS[card >> 2]
+
+def evaluate(cards):
+    tables = _load_tables()
+    key = 0
+    suit_masks = [0, 0, 0, 0]
+    for card in cards:
+        rank = card >> 2
+        key += RANK_KEYS[rank]
+        suit_masks[card & 3] |= 1 << rank
+    value = tables["rank_values"][key]
+    flush_values = tables["flush_values"]
+    for mask in suit_masks:
+        if flush_values[mask] > value: value = flush_values[mask]
+    return value
+
+def evaluate_batch(hands):
+    tables = _load_tables()
+    hands = np.asarray(hands, dtype=np.int64)
+    keys = tables["card_rank_keys"][hands].sum(axis=1)
+    values = tables["rank_table_values"][np.searchsorted(tables["rank_table_keys"], keys)]
+    # cards are distinct, so the sum of their bits is the 13 bit rank mask of each suit side by side
+    suit_masks = tables["card_suit_bits"][hands].sum(axis=1)
+    for suit in range(4):
+        values = np.maximum(values, tables["flush_table"][(suit_masks >> (13 * suit)) & 8191])
+    return values
+
+def hand_strength(value):
+    return HAND_STRENGTH_NAMES[value >> 20]
+
+def hand_ranks(value):
+    """Ranks ("2".."A" as 2..14) deciding ties, most significant first"""
+    category = value >> 20
+    return [((value >> shift) & 15) + 2 for shift in (16, 12, 8, 4, 0)][:RANK_COUNTS[category]]
+
+
+_tables = None
+
+def _load_tables():
+    global _tables
+    if _tables is None: _tables = _build_tables()
+    return _tables
+
+def _build_tables():
+    rank_values = {}
+    for card_count in (5, 6, 7):
+        for ranks in itertools.combinations_with_replacement(range(13), card_count):
+            counts = [0] * 13
+            for rank in ranks: counts[rank] += 1
+            if max(counts) > 4: continue
+            rank_values[sum([RANK_KEYS[rank] for rank in ranks])] = _eval_rank_counts(counts)
+    flush_values = [_eval_flush_mask(mask) for mask in range(1 << 13)]
+    keys = sorted(rank_values.keys())
+    return {
+            "rank_values": rank_values,
+            "flush_values": flush_values,
+            "rank_table_keys": np.array(keys, dtype=np.int64),
+            "rank_table_values": np.array([rank_values[key] for key in keys], dtype=np.int64),
+            "flush_table": np.array(flush_values, dtype=np.int64),
+            "card_rank_keys": np.array([RANK_KEYS[card >> 2] for card in range(52)], dtype=np.int64),
+            "card_suit_bits": np.array([1 << (card >> 2) << (13 * (card & 3)) for card in range(52)], dtype=np.int64)
+            }
+
+def _eval_rank_counts(counts):
+    groups = sorted([(count, rank) for rank, count in enumerate(counts) if count], reverse=True)
+    ranks = [rank for _count, rank in groups]
+    straight_high = _find_straight_high(sum([1 << rank for rank in ranks]))
+    if groups[0][0] == 4:
+        return _pack(FOURCARD, [ranks[0], max(ranks[1:])])
+    if groups[0][0] == 3 and groups[1][0] >= 2:
+        return _pack(FULLHOUSE, ranks[:2])
+    if straight_high is not None:
+        return _pack(STRAIGHT, [straight_high])
+    if groups[0][0] == 3:
+        return _pack(THREECARD, [ranks[0]] + sorted(ranks[1:], reverse=True)[:2])
+    if groups[1][0] == 2:
+        return _pack(TWOPAIR, ranks[:2] + [max(ranks[2:])])
+    if groups[0][0] == 2:
+        return _pack(ONEPAIR, [ranks[0]] + sorted(ranks[1:], reverse=True)[:3])
+    return _pack(HIGHCARD, sorted(ranks, reverse=True)[:5])
+
+def _eval_flush_mask(mask):
+    ranks = [rank for rank in range(12, -1, -1) if mask >> rank & 1]
+    if len(ranks) < 5: return 0
+    straight_high = _find_straight_high(mask)
+    if straight_high is not None:
+        return _pack(STRAIGHTFLASH, [straight_high])
+    return _pack(FLASH, ranks[:5])
+
+def _find_straight_high(mask):
+    # bit 0 holds the ace playing low (A-2-3-4-5), bit rank+1 holds each rank
+    mask = (mask << 1) | (mask >> 12 & 1)
+    for high in range(12, 2, -1):
+        if (mask >> (high - 3)) & 31 == 31: return high
+    return None
+
+def _pack(category, ranks):
+    value = category << 20
+    for shift, rank in zip((16, 12, 8, 4, 0), ranks):
+        value |= rank << shift
+    return value
+
+
+RANKS = "23456789TJQKA"
+SUITS = "CDHS"
+RANK_KEYS = [5 ** rank for rank in range(13)]
+
+HIGHCARD = 0
+ONEPAIR = 1
+TWOPAIR = 2
+THREECARD = 3
+STRAIGHT = 4
+FLASH = 5
+FULLHOUSE = 6
+FOURCARD = 7
+STRAIGHTFLASH = 8
+
+HAND_STRENGTH_NAMES = [
+        "HIGHCARD", "ONEPAIR", "TWOPAIR", "THREECARD", "STRAIGHT",
+        "FLASH", "FULLHOUSE", "FOURCARD", "STRAIGHTFLASH"
+        ]
+RANK_COUNTS = [5, 4, 3, 3, 1, 5, 2, 2, 1]  # tie breaking ranks per category
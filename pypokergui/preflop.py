@@ -0,0 +1,106 @@
+import os
+import time
+import struct
+import functools
+import multiprocessing
+
+import numpy as np
+
+import pypokergui.equity as EQ
+import pypokergui.hand_evaluator as HE
+
+"""Precomputed preflop equity of the 169 starting hand classes.
+    build_preflop_table() estimates the equity of every class against 1 to
+    MAX_OPPONENTS random hands and writes it to a binary file:
+
+      header : MAGIC (8 bytes), rank count, max opponents, runouts per entry
+               (little endian uint32), padded to HEADER_SIZE bytes
+      body   : float32 equity[13][13][max opponents]
+
+    In the body, [high][low] holds the suited hand and [low][high] the
+    offsuit hand of two ranks, and pairs sit on the diagonal.
+
+    The body is opened with np.memmap, so preflop_equity() is one array
+    lookup, and every bot process reading the file shares the same pages of
+    the OS page cache instead of loading its own copy.
+"""
+def preflop_equity(hole_card, opponents, path=None):
+    table = load_preflop_table(path)
+    assert 1 <= opponents <= table.shape[2]
+    high, low = hand_class_index(hole_card)
+    return float(table[high, low, opponents - 1])
+
+def hand_class_index(hole_card):
+    cards = HE.parse_cards(hole_card)
+    ranks = sorted([card >> 2 for card in cards], reverse=True)
+    suited = (cards[0] & 3) == (cards[1] & 3)
+    return (ranks[0], ranks[1]) if suited else (ranks[1], ranks[0])
+
+def hand_class_name(high, low):
+    if high == low: return HE.RANKS[high] * 2
+    if high > low: return HE.RANKS[high] + HE.RANKS[low] + "s"
+    return HE.RANKS[low] + HE.RANKS[high] + "o"
+
+def load_preflop_table(path=None):
+    path = path or DEFAULT_TABLE_PATH
+    if path not in _tables:
+        if not os.path.exists(path):
+            raise IOError("Preflop table [ %s ] was not found. Build it with \"python -m pypokergui build_preflop_table\"" % path)
+        with open(path, "rb") as f:
+            magic, rank_count, max_opponents, _runouts = struct.unpack(HEADER_FORMAT, f.read(struct.calcsize(HEADER_FORMAT)))
+        if magic != MAGIC:
+            raise IOError("[ %s ] is not a preflop table" % path)
+        _tables[path] = np.memmap(path, dtype="<f4", mode="r", offset=HEADER_SIZE,
+                shape=(rank_count, rank_count, max_opponents))
+    return _tables[path]
+
+def build_preflop_table(path=None, runouts=20000, workers=1, seed=None):
+    path = path or DEFAULT_TABLE_PATH
+    classes = [(high, low) for high in range(13) for low in range(13)]
+    calc = functools.partial(_calc_class_equities, runouts, seed)
+    start_time = time.time()
+    if workers == 1:
+        rows = [calc(hand_class) for hand_class in classes]
+    else:
+        with multiprocessing.Pool(workers) as pool:
+            rows = pool.map(calc, classes)
+    table = np.zeros((13, 13, MAX_OPPONENTS), dtype="<f4")
+    for (high, low), row in zip(classes, rows):
+        table[high, low] = row
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    # write to a temporary file first, so readers never map a half written table
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(struct.pack(HEADER_FORMAT, MAGIC, 13, MAX_OPPONENTS, runouts).ljust(HEADER_SIZE, b"\0"))
+        f.write(table.tobytes())
+    os.replace(tmp_path, path)
+    _tables.pop(path, None)
+    print("preflop table of %d classes x %d opponents was written to [ %s ] in %.1f sec" % (
+        len(classes), MAX_OPPONENTS, path, time.time() - start_time))
+    return table
+
+def _calc_class_equities(runouts, seed, hand_class):
+    row, col = hand_class
+    hole = _gen_class_hole(row, col)
+    deck = np.setdiff1d(np.arange(52), hole)
+    board = np.zeros(0, dtype=np.int64)
+    rng = np.random.default_rng(None if seed is None else [seed, row, col])
+    equities = []
+    for opponents in range(1, MAX_OPPONENTS + 1):
+        scores = EQ.simulate_runouts(hole, board, opponents, deck, runouts, rng)
+        equities.append(scores.mean())
+    return equities
+
+def _gen_class_hole(row, col):
+    # a representative hand of the class: two clubs if suited, else a club and a diamond
+    if row > col: return np.array([row * 4, col * 4], dtype=np.int64)
+    return np.array([col * 4, row * 4 + 1], dtype=np.int64)
+
+
+MAGIC = b"PPGPRE01"
+HEADER_FORMAT = "<8sIII"
+HEADER_SIZE = 32
+MAX_OPPONENTS = 9
+DEFAULT_TABLE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "preflop_table.bin")
+
+_tables = {}  # path => memmap
@@ -0,0 +1,215 @@
+import time
+import queue
+import asyncio
+import logging
+import threading
+import multiprocessing
+
+"""Host AI players in worker processes.
+    The server talks to each worker over a pair of one-way pipes with
+    compact tuple messages of the form (command, *args):
+
+      server -> worker : (<receive_* method name>, *args)
+                         ("set_uuid", uuid)
+                         ("declare_action", seq, valid_actions, hole_card, round_state)
+                         ("shutdown",)
+      worker -> server : ("ready", error_or_None, timings)
+                         ("action", seq, action, amount)
+
+    Notifications are queued and written by a sender thread, so a bot which
+    stopped reading its pipe never blocks the IOLoop. Answers to
+    declare_action are awaited on the IOLoop, which watches the pipe of the
+    worker, until the deadline.
+
+    Every worker imports, builds and warms up its bot at the same time, so
+    a table is ready as soon as its slowest bot is. The IOLoop keeps serving
+    the other tables meanwhile, as it only watches the pipes of the workers.
+    timings of the ready message hold the seconds each step took in the
+    worker.
+"""
+class AIPlayerProcess(object):
+
+    def __init__(self, setup_script_path):
+        self.setup_script_path = setup_script_path
+        self.request_reader, self.request_writer = _context.Pipe(duplex=False)
+        self.response_reader, self.response_writer = _context.Pipe(duplex=False)
+        self.process = _context.Process(
+                target=run_ai_worker,
+                args=(self.request_reader, self.response_writer, setup_script_path),
+                daemon=True)
+        self.outbox = queue.Queue()
+        self.sender = threading.Thread(target=self._send_loop, daemon=True)
+        self.seq = 0
+        self.start_time = None
+        self.startup_timings = {}
+
+    def start(self):
+        self.start_time = time.time()
+        self.process.start()
+        # close the child ends so that a dead worker is seen as EOF
+        self.request_reader.close()
+        self.response_writer.close()
+        self.sender.start()
+
+    async def wait_until_ready(self, deadline=None):
+        remaining = None if deadline is None else max(0, deadline - time.time())
+        if not await _wait_readable(self.response_reader, remaining):
+            raise Exception("AI from [ %s ] was not ready within the startup timeout" % self.setup_script_path)
+        try:
+            command, error, timings = self.response_reader.recv()
+        except EOFError:
+            raise Exception("Worker of [ %s ] died during its setup" % self.setup_script_path)
+        assert command == READY
+        self.startup_timings = dict(timings, ready=time.time() - self.start_time)
+        if error:
+            raise Exception("Failed to setup ai from [ %s ] (%s)" % (self.setup_script_path, error))
+
+    async def ask_action(self, valid_actions, hole_card, round_state, timeout=None):
+        # Returns None when the deadline passed or the worker has died.
+        # Late answers of previous asks are discarded by their seq.
+        self.seq += 1
+        self._post(DECLARE_ACTION, self.seq, valid_actions, hole_card, round_state)
+        deadline = None if timeout is None else time.time() + timeout
+        while True:
+            remaining = None if deadline is None else max(0, deadline - time.time())
+            if not await _wait_readable(self.response_reader, remaining): return None
+            try:
+                message = self.response_reader.recv()
+            except (EOFError, OSError):
+                return None
+            if message[0] == ACTION and message[1] == self.seq:
+                return message[2], message[3]
+
+    def set_uuid(self, uuid):
+        self._post("set_uuid", uuid)
+
+    def receive_game_start_message(self, game_info):
+        self._post("receive_game_start_message", game_info)
+
+    def receive_round_start_message(self, round_count, hole_card, seats):
+        self._post("receive_round_start_message", round_count, hole_card, seats)
+
+    def receive_street_start_message(self, street, round_state):
+        self._post("receive_street_start_message", street, round_state)
+
+    def receive_game_update_message(self, action, round_state):
+        self._post("receive_game_update_message", action, round_state)
+
+    def receive_round_result_message(self, winners, hand_info, round_state):
+        self._post("receive_round_result_message", winners, hand_info, round_state)
+
+    def shutdown(self):
+        # ask the worker to exit, and kill it if it is still busy after the grace period
+        self.outbox.put(None)
+        reaper = threading.Timer(SHUTDOWN_GRACE_PERIOD, self._terminate)
+        reaper.daemon = True
+        reaper.start()
+
+    def _post(self, *message):
+        self.outbox.put(message)
+
+    def _send_loop(self):
+        while True:
+            message = self.outbox.get()
+            if message is None: message = (SHUTDOWN,)
+            try:
+                self.request_writer.send(message)
+            except (BrokenPipeError, OSError):
+                break
+            if message[0] == SHUTDOWN: break
+
+    def _terminate(self):
+        if self.process.is_alive():
+            self.process.terminate()
+        self.process.join()
+
+
+async def build_ai_processes(members_info, startup_timeout=None):
+    holder = {}
+    for member in members_info:
+        if member["type"] == "human": continue
+        holder[member["uuid"]] = AIPlayerProcess(member["setup_script_path"])
+    for ai_process in holder.values():
+        ai_process.start()
+    deadline = None if startup_timeout is None else time.time() + startup_timeout
+    waits = [asyncio.ensure_future(ai_process.wait_until_ready(deadline)) for ai_process in holder.values()]
+    try:
+        # workers are taken as they get ready, so a broken bot fails the start at once
+        if waits:
+            done, pending = await asyncio.wait(waits, return_when=asyncio.FIRST_EXCEPTION)
+            for wait in done: wait.result()
+    except BaseException:
+        for wait in waits: wait.cancel()
+        for ai_process in holder.values():
+            ai_process.shutdown()
+        raise
+    print(format_startup_report(members_info, holder))
+    return holder
+
+def format_startup_report(members_info, holder):
+    lines = ["ai startup (sec)", "%-20s %8s %8s %8s %8s" % ("name", "import", "init", "warm_up", "ready")]
+    for member in members_info:
+        if member["uuid"] not in holder: continue
+        timings = holder[member["uuid"]].startup_timings
+        lines.append("%-20s %8.3f %8.3f %8.3f %8.3f" % (member["name"][:20],
+            timings["import"], timings["init"], timings["warm_up"], timings["ready"]))
+    return "\n".join(lines)
+
+def run_ai_worker(request_reader, response_writer, setup_script_path):
+    import pypokergui.server.game_manager as GM
+    timings = {}
+    try:
+        player = GM._build_ai_player(setup_script_path, timings)
+    except Exception as e:
+        response_writer.send((READY, repr(e), timings))
+        return
+    response_writer.send((READY, None, timings))
+    while True:
+        try:
+            message = request_reader.recv()
+        except EOFError:
+            break
+        command = message[0]
+        if SHUTDOWN == command:
+            break
+        elif DECLARE_ACTION == command:
+            seq, valid_actions, hole_card, round_state = message[1:]
+            try:
+                action, amount = player.declare_action(valid_actions, hole_card, round_state)
+            except:
+                # If error or fail to return a valid value,
+                action, amount = 'fold', 0
+            response_writer.send((ACTION, seq, action, amount))
+        else:
+            try:
+                getattr(player, command)(*message[1:])
+            except:
+                logging.error("Error in [ %s ] of [ %s ]" % (command, setup_script_path), exc_info=True)
+
+
+async def _wait_readable(reader, timeout):
+    # The IOLoop watches the pipe, so no thread is held while a worker is
+    # busy. EOF of a dead worker makes the pipe readable too.
+    if reader.poll(): return True
+    loop = asyncio.get_running_loop()
+    readable = loop.create_future()
+    loop.add_reader(reader.fileno(), _resolve, readable)
+    try:
+        await asyncio.wait_for(readable, timeout)
+        return True
+    except asyncio.TimeoutError:
+        return False
+    finally:
+        loop.remove_reader(reader.fileno())
+
+def _resolve(future):
+    if not future.done(): future.set_result(None)
+
+
+READY = "ready"
+ACTION = "action"
+DECLARE_ACTION = "declare_action"
+SHUTDOWN = "shutdown"
+SHUTDOWN_GRACE_PERIOD = 1
+
+_context = multiprocessing.get_context("spawn")
@@ -0,0 +1,58 @@
+import logging
+from collections import deque
+
+import tornado.ioloop
+
+
+class DeliveryScheduler(object):
+    """Deliver the paced messages of one table without blocking the IOLoop.
+
+    Each delivery is queued with the wait interval which should follow it.
+    Deliveries are invoked in order, and the next one is scheduled on the
+    IOLoop after the interval has elapsed, so other sockets keep being
+    served while the table is pacing its game events.
+
+    A paused scheduler keeps queueing deliveries but invokes none of them
+    until it is resumed.
+    """
+
+    def __init__(self):
+        self.queue = deque()
+        self.waiting = False
+        self.paused = False
+
+    def schedule(self, deliver, wait_interval):
+        self.queue.append((deliver, wait_interval))
+        if not self.waiting and not self.paused:
+            self._deliver_next()
+
+    def pause(self):
+        self.paused = True
+
+    def resume(self):
+        self.paused = False
+        # a wait which is still running delivers the rest when it ends
+        if not self.waiting:
+            self._deliver_next()
+
+    def clear(self):
+        self.queue.clear()
+
+    def is_idle(self):
+        return not self.waiting and not self.queue
+
+    def _deliver_next(self):
+        if self.paused:
+            self.waiting = False
+            return
+        self.waiting = True
+        while self.queue:
+            deliver, wait_interval = self.queue.popleft()
+            try:
+                deliver()
+            except:
+                logging.error("Error delivering message", exc_info=True)
+            if wait_interval > 0:
+                tornado.ioloop.IOLoop.current().call_later(wait_interval, self._deliver_next)
+                return
+        self.waiting = False
@@ -0,0 +1,134 @@
+import time
+import asyncio
+import logging
+import functools
+
+import pypokergui.server.game_manager as GM
+import pypokergui.server.message_manager as MM
+import pypokergui.server.metrics as MT
+
+"""Progress the game of one table in its own asyncio task.
+    The task starts the bots of the table and the game, then asks the next
+    seat for its action, applies it and broadcasts the updates, and yields
+    to the IOLoop between actions. So a long run of bot decisions never
+    holds up the messages of other sockets, and the websocket handlers only
+    hand the actions of the humans over to the task through declare_action().
+
+    The table can be paused between actions. The paced updates which are
+    still queued are held back too, and the clock of a human who is being
+    asked is stopped while the table is paused.
+"""
+class TableGameLoop(object):
+
+    def __init__(self, table, handler, mode):
+        self.table = table
+        self.handler = handler
+        self.mode = mode
+        self.task = None
+        self.paused = False
+        self.resumed = asyncio.Event()
+        self.resumed.set()
+        self.interrupt = None
+        self.human_action = None
+
+    def start(self):
+        self.task = asyncio.ensure_future(self._run())
+
+    def stop(self):
+        if self.task: self.task.cancel()
+
+    def declare_action(self, uuid, action, amount):
+        if uuid != self.table.game_manager.next_player_uuid: return False
+        if self.human_action is None or self.human_action.done(): return False
+        self.human_action.set_result((action, amount))
+        return True
+
+    def toggle_pause(self):
+        self.paused = not self.paused
+        if self.paused:
+            self.resumed.clear()
+            self.table.scheduler.pause()
+        else:
+            self.resumed.set()
+            self.table.scheduler.resume()
+        if self.interrupt and not self.interrupt.done():
+            self.interrupt.set_result(None)
+        MM.broadcast_game_state(self.table.sockets, self.paused)
+
+    async def _run(self):
+        game_manager = self.table.game_manager
+        try:
+            if not await self._start_game(): return
+            self._broadcast_update_game()
+            while not GM.has_game_finished(game_manager.latest_messages):
+                await self.resumed.wait()
+                uuid = game_manager.next_player_uuid
+                if game_manager.is_ai_player(uuid):
+                    action, amount = await self._ask_ai(uuid)
+                else:
+                    action, amount = await self._ask_human(uuid)
+                if self.table.closed: return
+                game_manager.update_game(action, amount)
+                self._broadcast_update_game()
+                # let the other sockets of the server in before the next action
+                await asyncio.sleep(0)
+        except asyncio.CancelledError:
+            raise
+        except:
+            logging.error("Game loop of table [ %s ] failed" % self.table.table_id, exc_info=True)
+        finally:
+            game_manager.shutdown_ai_players()
+
+    async def _start_game(self):
+        # the seats are taken once every bot is ready
+        game_manager = self.table.game_manager
+        try:
+            await game_manager.start_ai_processes()
+        except Exception as e:
+            logging.error("Failed to start the game of table [ %s ]" % self.table.table_id, exc_info=True)
+            self.table.game_loop = None
+            MM.broadcast_start_failure(self.table.sockets, e)
+            return False
+        game_manager.start_game()
+        MM.broadcast_start_game(self.handler, game_manager, self.table.sockets)
+        return True
+
+    async def _ask_ai(self, uuid):
+        game_manager = self.table.game_manager
+        start_time = time.perf_counter()
+        action, amount = await game_manager.ask_action_to_ai_process(uuid)
+        MT.AI_DECISION_SECONDS.observe(
+                time.perf_counter() - start_time, game_manager.members_index[uuid]["name"])
+        return action, amount
+
+    async def _ask_human(self, uuid):
+        game_manager = self.table.game_manager
+        loop = asyncio.get_running_loop()
+        self.human_action = loop.create_future()
+        # the clock starts once the ask is delivered, so the pacing of the
+        # table is not counted as thinking time
+        ask_delivered = loop.create_future()
+        self.table.scheduler.schedule(functools.partial(_resolve, ask_delivered), 0)
+        await ask_delivered
+        time_limit = game_manager.decision_time_limit(uuid)
+        thinking = 0
+        while not self.human_action.done():
+            await self.resumed.wait()
+            self.interrupt = loop.create_future()
+            remaining = None if time_limit is None else max(0, time_limit - thinking)
+            start_time = time.time()
+            await asyncio.wait([self.human_action, self.interrupt],
+                    timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+            thinking += time.time() - start_time
+            if not self.human_action.done() and time_limit is not None and thinking >= time_limit:
+                self.human_action.set_result(game_manager.gen_expired_action())
+        game_manager.charge_decision_time(uuid, thinking)
+        return self.human_action.result()
+
+    def _broadcast_update_game(self):
+        MM.broadcast_update_game(
+            self.table.game_manager, self.table.sockets, self.table.scheduler, self.mode)
+
+
+def _resolve(future):
+    if not future.done(): future.set_result(None)
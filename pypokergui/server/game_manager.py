@@ -1,11 +1,28 @@
+import time
+
 import pypokergui.engine_wrapper as Engine
 import pypokergui.ai_generator as AG
+import pypokergui.server.ai_process as AP
+import pypokergui.server.hand_recorder as HR
+import pypokergui.server.metrics as MT
 
 class GameManager(object):
 
-    def __init__(self):
+    def __init__(self, isolate_ai=False, in_place_engine=False):
+        self.isolate_ai = isolate_ai
+        self.in_place_engine = in_place_engine
+        self.fast_showdown = False
+        self.deck_source = None  # shuffled decks
+        self.ai_timeout = DEFAULT_AI_TIMEOUT
+        self.ai_timeout_action = "fold"
+        self.ai_startup_timeout = DEFAULT_AI_STARTUP_TIMEOUT
+        self.base_decision_time = None  # time banks are off
+        self.initial_time_bank = 0
+        self.time_bank_action = "fold"
+        self.time_banks = {}  # uuid => seconds left in the bank
         self.rule = None
         self.members_info = []
+        self.members_index = {}  # uuid => member info
         self.engine = None
         self.ai_players = {}
         self.is_playing_poker = False
@@ -13,57 +30,161 @@ class GameManager(object):
         self.next_player_uuid = None
 
         self.hole_cards = {}
+        self.latest_round_state = None
+
+        self.recorder = None
+        self.game_id = None
+        self.hand_history = None
 
     def define_rule(self, max_round, initial_stack, small_blind, ante, blind_structure):
         self.rule = Engine.gen_game_config(max_round, initial_stack, small_blind, ante, blind_structure)
 
+    def attach_recorder(self, recorder, game_id):
+        # recorder is anything with record(hand), e.g. a HR.HandRecorder
+        self.recorder = recorder
+        self.game_id = game_id
+
+    def define_ai_timeout(self, timeout, timeout_action="fold", startup_timeout=None):
+        assert timeout is None or timeout > 0
+        assert timeout_action in ["fold", "call"]
+        assert startup_timeout is None or startup_timeout > 0
+        self.ai_timeout = timeout
+        self.ai_timeout_action = timeout_action
+        self.ai_startup_timeout = startup_timeout
+
+    def define_time_bank(self, base_time, bank, timeout_action="fold"):
+        # Chess clock of every seat: each decision gets base_time for free,
+        # and the time beyond it is drawn from the bank of the seat. A seat
+        # which runs out of both plays timeout_action.
+        assert base_time > 0 and bank >= 0
+        assert timeout_action in ["fold", "call"]
+        self.base_decision_time = base_time
+        self.initial_time_bank = bank
+        self.time_bank_action = timeout_action
+
+    def decision_time_limit(self, uuid):
+        if self.base_decision_time is None:
+            return self.ai_timeout if self.is_ai_player(uuid) else None
+        return self.base_decision_time + self.time_banks.get(uuid, 0)
+
+    def charge_decision_time(self, uuid, elapsed):
+        if self.base_decision_time is None: return
+        overtime = max(0, elapsed - self.base_decision_time)
+        self.time_banks[uuid] = max(0, self.time_banks.get(uuid, 0) - overtime)
+
+    def gen_expired_action(self):
+        # the action of the asked seat when its decision time ran out
+        _ask_uuid, ask_message = self.latest_messages[-1]
+        assert ask_message['type'] == 'ask'
+        timeout_action = self.ai_timeout_action if self.base_decision_time is None else self.time_bank_action
+        return gen_timeout_action(ask_message['message']['valid_actions'], timeout_action)
+
     def join_ai_player(self, name, setup_script_path):
         ai_uuid = str(len(self.members_info))
-        self.members_info.append(gen_ai_player_info(name, ai_uuid, setup_script_path))
+        self._join_member(gen_ai_player_info(name, ai_uuid, setup_script_path))
 
     def join_human_player(self, name, uuid):
-        self.members_info.append(gen_human_player_info(name, uuid))
+        if uuid in self.members_index: return
+        self._join_member(gen_human_player_info(name, uuid))
 
     def get_human_player_info(self, uuid):
-        for info in self.members_info:
-            if info["type"] == "human" and info["uuid"] == uuid:
-                return info
+        info = self.members_index.get(uuid)
+        if info and info["type"] == "human":
+            return info
+
+    def is_ai_player(self, uuid):
+        info = self.members_index.get(uuid)
+        return info is not None and info["type"] == "ai"
 
     def remove_human_player_info(self, uuid):
         member_info = self.get_human_player_info(uuid)
         assert member_info
         self.members_info.remove(member_info)
+        del self.members_index[uuid]
+
+    def _join_member(self, member_info):
+        self.members_info.append(member_info)
+        self.members_index[member_info["uuid"]] = member_info
+
+    async def start_ai_processes(self):
+        # isolated bots are started before start_game, without blocking the IOLoop
+        assert self.isolate_ai and not self.is_playing_poker
+        self.ai_players = await AP.build_ai_processes(self.members_info, self.ai_startup_timeout)
 
     def start_game(self):
         assert self.rule and len(self.members_info) >= 2 and not self.is_playing_poker
         uuid_list = [member["uuid"] for member in self.members_info]
         name_list = [member["name"] for member in self.members_info]
         players_info = Engine.gen_players_info(uuid_list, name_list)
-        self.ai_players = build_ai_players(self.members_info)
-        self.engine = Engine.EngineWrapper()
+        if not self.isolate_ai:
+            self.ai_players = build_ai_players(self.members_info)
+        self.engine = Engine.EngineWrapper(self.in_place_engine, self.fast_showdown, self.deck_source)
+        self.time_banks = { uuid: self.initial_time_bank for uuid in uuid_list }
         self.latest_messages = self.engine.start_game(players_info, self.rule)
+        self.latest_round_state = None
         self.is_playing_poker = True
         self.next_player_uuid = fetch_next_player_uuid(self.latest_messages)
+        if self.recorder:
+            self.hand_history = HR.HandHistoryBuilder(self.game_id)
+            self._record_hands()
 
     def update_game(self, action, amount):
         assert len(self.latest_messages) != 0  # check that start_game has already called
+        start_time = time.perf_counter()
         self.latest_messages = self.engine.update_game(action, amount)
+        MT.ENGINE_UPDATE_SECONDS.observe(time.perf_counter() - start_time)
         self.next_player_uuid = fetch_next_player_uuid(self.latest_messages)
+        if self.recorder: self._record_hands()
+
+    def _record_hands(self):
+        for hand in self.hand_history.feed(self.latest_messages):
+            self.recorder.record(hand)
 
     def ask_action_to_ai_player(self, uuid):
         assert uuid in self.ai_players
         ai_player = self.ai_players[uuid]
         ask_uuid, ask_message = self.latest_messages[-1]
         assert ask_message['type'] == 'ask' and uuid == ask_uuid
+        time_limit = self.decision_time_limit(uuid)
+        start_time = time.time()
         try:
-            return ai_player.declare_action(
+            declared = ai_player.declare_action(
                     ask_message['message']['valid_actions'],
                     ask_message['message']['hole_card'],
                     ask_message['message']['round_state']
             )
         except:
             # If error or fail to return a valid value,
-            return ['fold', 0]
+            declared = ['fold', 0]
+        elapsed = time.time() - start_time
+        self.charge_decision_time(uuid, elapsed)
+        # an in process bot can't be interrupted, so a late answer is replaced
+        if time_limit is not None and elapsed > time_limit:
+            return self.gen_expired_action()
+        return declared
+
+    async def ask_action_to_ai_process(self, uuid):
+        assert self.isolate_ai and uuid in self.ai_players
+        ai_process = self.ai_players[uuid]
+        ask_uuid, ask_message = self.latest_messages[-1]
+        assert ask_message['type'] == 'ask' and uuid == ask_uuid
+        start_time = time.time()
+        declared = await ai_process.ask_action(
+                ask_message['message']['valid_actions'],
+                ask_message['message']['hole_card'],
+                ask_message['message']['round_state'],
+                self.decision_time_limit(uuid)
+        )
+        self.charge_decision_time(uuid, time.time() - start_time)
+        if declared is None:
+            # The ai missed its deadline (or its process has died)
+            return self.gen_expired_action()
+        return declared
+
+    def shutdown_ai_players(self):
+        if not self.isolate_ai: return
+        for ai_process in self.ai_players.values():
+            ai_process.shutdown()
 
     def reset_hole_record(self):
         self.hole_cards = {}
@@ -74,16 +195,93 @@ class GameManager(object):
             self.hole_cards[uuid] = hole_cards
         return
 
+def setup_game_manager(config, isolate_ai=False, in_place_engine=False):
+    game_manager = GameManager(isolate_ai, in_place_engine)
+    game_manager.define_rule(
+        config['max_round'], config['initial_stack'], config['small_blind'],
+        config['ante'], config['blind_structure']
+    )
+    game_manager.define_ai_timeout(
+        config.get('ai_timeout', DEFAULT_AI_TIMEOUT), config.get('ai_timeout_action', 'fold'),
+        config.get('ai_startup_timeout', DEFAULT_AI_STARTUP_TIMEOUT))
+    if config.get('time_bank'):
+        time_bank = config['time_bank']
+        game_manager.define_time_bank(
+            time_bank['base'], time_bank.get('bank', 0), time_bank.get('action', 'fold'))
+    game_manager.fast_showdown = config.get('fast_showdown', False)
+    for player in config['ai_players']:
+        game_manager.join_ai_player(player['name'], player['path'])
+    return game_manager
+
 def fetch_next_player_uuid(new_messages):
     if not has_game_finished(new_messages):
         ask_uuid, ask_message = new_messages[-1]
         assert ask_message['type'] == 'ask'
         return ask_uuid
 
+def gen_timeout_action(valid_actions, timeout_action):
+    call_action_info = valid_actions[1]
+    # never fold when checking is free
+    if timeout_action == "call" or call_action_info["amount"] == 0:
+        return call_action_info["action"], call_action_info["amount"]
+    return "fold", 0
+
 def has_game_finished(new_messages):
     _uuid, last_message = new_messages[-1]
     return "game_result_message" == last_message['message']['message_type']
 
+def broadcast_game_start_to_ai(game_manager):
+    game_info = gen_game_info(game_manager)
+    for uuid, player in game_manager.ai_players.items():
+        player.receive_game_start_message(game_info)
+        player.set_uuid(uuid)
+
+def gen_game_info(game_manager):
+    seats = game_manager.latest_messages[0][1]["message"]["seats"]
+    copy_seats = [{k: v for k, v in player.items()} for player in seats]
+    for player in copy_seats:
+        player["stack"] = game_manager.rule["initial_stack"]
+    player_num = len(seats)
+    rule = {k: v for k, v in game_manager.rule.items()}
+    rule["small_blind_amount"] = rule.pop("small_blind")
+    return {
+            "seats": copy_seats,
+            "player_num": player_num,
+            "rule": rule,
+            }
+
+def broadcast_message_to_ai(ai_player, message):
+    message_type = message['message']['message_type']
+    hole = False
+    if ('hole_card' in message['message'].keys()):
+        hole = message['message']['hole_card']
+    if 'round_start_message' == message_type:
+        round_count = message['message']['round_count']
+        hole_card = message['message']['hole_card']
+        seats = message['message']['seats']
+        ai_player.receive_round_start_message(round_count, hole_card, seats)
+    elif 'street_start_message' == message_type:
+        street = message['message']['street']
+        round_state = message['message']['round_state']
+        ai_player.receive_street_start_message(street, round_state)
+    elif 'game_update_message' == message_type:
+        action = message['message']['action']
+        round_state = message['message']['round_state']
+        ai_player.receive_game_update_message(action, round_state)
+    elif 'round_result_message' == message_type:
+        winners = message['message']['winners']
+        round_state = message['message']['round_state']
+        hand_info = message['message']['hand_info']
+        if (hole):
+            print(hole)
+        ai_player.receive_round_result_message(winners, hand_info, round_state)
+    elif 'game_result_message' == message_type:
+        pass  # ai does not handle game result
+    elif 'ask_message' == message_type:
+        pass  # ask message handling is done in GameManager.ask_action_to_ai_player
+    else:
+        raise Exception("Unexpected message received : %r" % message)
+
 def build_ai_players(members_info):
     holder = {}
     for member in members_info:
@@ -91,11 +289,12 @@ def build_ai_players(members_info):
         holder[member["uuid"]] = _build_ai_player(member["setup_script_path"])
     return holder
 
-def _build_ai_player(setup_script_path):
-    if not AG.healthcheck(setup_script_path, quiet=True):
-        raise Exception("Failed to setup ai from [ %s ]" % setup_script_path)
-    setup_method = AG._import_setup_method(setup_script_path)
-    return setup_method()
+def _build_ai_player(setup_script_path, timings=None):
+    # the health checked player is the one which takes the seat
+    try:
+        return AG.setup_player(setup_script_path, timings)
+    except Exception as e:
+        raise Exception("Failed to setup ai from [ %s ] (%s)" % (setup_script_path, e))
 
 def gen_ai_player_info(name, uuid, setup_script_path):
     info = _gen_base_player_info("ai", name, uuid)
@@ -112,3 +311,5 @@ def _gen_base_player_info(player_type, name, uuid):
             "uuid": uuid
             }
 
+DEFAULT_AI_TIMEOUT = 10  # sec
+DEFAULT_AI_STARTUP_TIMEOUT = 60  # sec
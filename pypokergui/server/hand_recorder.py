@@ -0,0 +1,141 @@
+import os
+import json
+import time
+import queue
+import logging
+import threading
+
+"""Record complete hand histories to a line delimited JSON log.
+    HandHistoryBuilder collects the engine messages of one game and returns
+    a record per finished hand:
+
+      { "game", "round_count", "recorded_at", "small_blind_amount", "ante",
+        "dealer_btn", "small_blind_pos", "big_blind_pos",
+        "seats": [{ "uuid", "name", "stack" (before blinds and ante) }],
+        "hole_cards": { uuid: ["SA", "HK"] },
+        "actions": [{ "street", "uuid", "action", "amount" }],
+        "board": ["C2", ...], "winners": [uuid], "hand_info": [...],
+        "stacks": { uuid: stack after the hand } }
+
+    This is enough to deal the hand again with a cheat deck and replay it
+    through the engine. HandRecorder writes the records from a background
+    thread, flushing whenever it runs out of work, and rotates the log to
+    path.1, path.2, ... when it grows past max_bytes. If the log can't be
+    opened, the error is logged and later records are ignored.
+"""
+class HandHistoryBuilder(object):
+
+    def __init__(self, game_id):
+        self.game_id = game_id
+        self.hand = None
+
+    def feed(self, messages):
+        hands = []
+        for destination, message in messages:
+            if message['type'] == 'ask': continue
+            body = message['message']
+            message_type = body['message_type']
+            if 'round_start_message' == message_type:
+                if self.hand is None or self.hand['round_count'] != body['round_count']:
+                    self.hand = self._start_hand(body)
+                self.hand['hole_cards'][destination] = body['hole_card']
+            elif 'game_update_message' == message_type:
+                action = body['action']
+                self.hand['actions'].append({
+                    'street': body['round_state']['street'],
+                    'uuid': action['player_uuid'],
+                    'action': action['action'],
+                    'amount': action['amount']
+                })
+            elif 'round_result_message' == message_type:
+                hands.append(self._finish_hand(body))
+        return hands
+
+    def _start_hand(self, message):
+        return {
+                'game': self.game_id,
+                'round_count': message['round_count'],
+                'recorded_at': time.time(),
+                'seats': [{ 'uuid': seat['uuid'], 'name': seat['name'], 'stack': seat['stack'] } for seat in message['seats']],
+                'hole_cards': {},
+                'actions': []
+                }
+
+    def _finish_hand(self, message):
+        hand, self.hand = self.hand, None
+        round_state = message['round_state']
+        forced_bets = [history for history in round_state['action_histories'].get('preflop', [])
+                if history['action'] in FORCED_BET_ACTIONS]
+        # seats were captured after the blinds and ante were collected
+        for seat in hand['seats']:
+            seat['stack'] += sum([history['amount'] for history in forced_bets if history['uuid'] == seat['uuid']])
+        hand.update({
+            'small_blind_amount': round_state['small_blind_amount'],
+            'ante': next((history['amount'] for history in forced_bets if history['action'] == 'ANTE'), 0),
+            'dealer_btn': round_state['dealer_btn'],
+            'small_blind_pos': round_state['small_blind_pos'],
+            'big_blind_pos': round_state['big_blind_pos'],
+            'board': round_state['community_card'],
+            'winners': [winner['uuid'] for winner in message['winners']],
+            'hand_info': message['hand_info'],
+            'stacks': { seat['uuid']: seat['stack'] for seat in round_state['seats'] }
+            })
+        return hand
+
+
+class HandRecorder(object):
+
+    def __init__(self, path, max_bytes=64 * 1024 * 1024, backup_count=5):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.queue = queue.Queue()
+        self.failed = False
+        self.writer = threading.Thread(target=self._write_loop, daemon=True)
+        self.writer.start()
+
+    def record(self, hand):
+        # only enqueues, encoding and disk I/O happen on the writer thread
+        if self.failed: return
+        self.queue.put(hand)
+
+    def close(self):
+        self.queue.put(None)
+        self.writer.join()
+
+    def _write_loop(self):
+        f = self._open()
+        while f:
+            hand = self.queue.get()
+            if hand is None: break
+            try:
+                f.write(json.dumps(hand, separators=(",", ":")) + "\n")
+                if self.queue.empty(): f.flush()
+                if f.tell() >= self.max_bytes:
+                    f.close()
+                    self._rotate()
+            except Exception:
+                logging.error("Failed to record a hand to [ %s ]" % self.path, exc_info=True)
+            if f.closed: f = self._open()
+        if f: f.close()
+
+    def _open(self):
+        try:
+            return open(self.path, "a", encoding="utf-8")
+        except OSError:
+            logging.error("Failed to open [ %s ], no more hands are recorded" % self.path, exc_info=True)
+            self.failed = True
+            return None
+
+    def _rotate(self):
+        # path => path.1 => path.2 ... and the oldest one is dropped
+        for idx in range(self.backup_count - 1, 0, -1):
+            if os.path.exists("%s.%d" % (self.path, idx)):
+                os.replace("%s.%d" % (self.path, idx), "%s.%d" % (self.path, idx + 1))
+        if self.backup_count > 0:
+            os.replace(self.path, "%s.1" % self.path)
+        else:
+            os.remove(self.path)
+
+
+FORCED_BET_ACTIONS = ['SMALLBLIND', 'BIGBLIND', 'ANTE']
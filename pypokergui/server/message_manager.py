@@ -1,16 +1,23 @@
 import time
 import logging
+import functools
+
+from collections import OrderedDict
 
 import tornado.escape
 
+import pypokergui.server.game_manager as GM
+import pypokergui.server.shared_frame as SF
+import pypokergui.server.metrics as MT
+
 
 def alert_server_restart(handler, uuid, sockets):
-    soc = _find_socket_by_uuid(sockets, uuid)
+    soc = sockets[uuid]
     soc.write_message(_gen_alert_server_restart_message(handler))
 
 
 def _gen_alert_server_restart_message(handler):
-    message = "Server has already run. Please restart the server to play the game again."
+    message = "This table has already run its game. Please open a new table from the lobby to play again."
     return {
         'message_type': 'alert_restart_server',
         'message': message
@@ -18,9 +25,12 @@ def _gen_alert_server_restart_message(handler):
 
 
 def broadcast_config_update(handler, game_manager, sockets):
-    for soc in sockets:
+    for soc in sockets.values():
         try:
-            soc.write_message(_gen_config_update_message(handler, game_manager, soc.uuid))
+            start_time = time.perf_counter()
+            message = _gen_config_update_message(handler, game_manager, soc.uuid)
+            MT.RENDER_SECONDS.observe(time.perf_counter() - start_time, 'config_update')
+            soc.send_frame(tornado.escape.json_encode(message), droppable=False)
         except:
             logging.error("Error sending message", exc_info=True)
 
@@ -40,31 +50,16 @@ def _gen_config_update_message(handler, game_manager, uuid):
 
 def broadcast_start_game(handler, game_manager, sockets):
     # broadcast message to browser bia sockets
-    for soc in sockets:
+    for soc in sockets.values():
         try:
-            soc.write_message(_gen_start_game_message(handler, game_manager, soc.uuid))
+            start_time = time.perf_counter()
+            message = _gen_start_game_message(handler, game_manager, soc.uuid)
+            MT.RENDER_SECONDS.observe(time.perf_counter() - start_time, 'start_game')
+            soc.send_frame(tornado.escape.json_encode(message), droppable=False)
         except:
             logging.error("Error sending message", exc_info=True)
     # broadcast message to ai by invoking proper callback method
-    game_info = _gen_game_info(game_manager)
-    for uuid, player in game_manager.ai_players.items():
-        player.receive_game_start_message(game_info)
-        player.set_uuid(uuid)
-
-
-def _gen_game_info(game_manager):
-    seats = game_manager.latest_messages[0][1]["message"]["seats"]
-    copy_seats = [{k: v for k, v in player.items()} for player in seats]
-    for player in copy_seats:
-        player["stack"] = game_manager.rule["initial_stack"]
-    player_num = len(seats)
-    rule = {k: v for k, v in game_manager.rule.items()}
-    rule["small_blind_amount"] = rule.pop("small_blind")
-    return {
-        "seats": copy_seats,
-        "player_num": player_num,
-        "rule": rule,
-    }
+    GM.broadcast_game_start_to_ai(game_manager)
 
 
 def _gen_start_game_message(handler, game_manager, uuid):
@@ -75,187 +70,251 @@ def _gen_start_game_message(handler, game_manager, uuid):
 
     return {
         'message_type': 'start_game',
-        'html': html
+        'html': html,
+        'ai_players': [info["uuid"] for info in game_manager.members_info if info["type"] == "ai"]
     }
 
 
-def broadcast_update_game(handler, game_manager, sockets, mode="moderate"):
+def broadcast_start_failure(sockets, error):
+    message = tornado.escape.json_encode({
+        'message_type': 'alert_start_failure',
+        'message': "The game could not be started: %s" % error
+    })
+    for soc in sockets.values():
+        try:
+            soc.send_frame(message, droppable=False)
+        except:
+            logging.error("Error sending message", exc_info=True)
+
+
+def broadcast_game_state(sockets, paused):
+    message = tornado.escape.json_encode({
+        'message_type': 'game_state_update',
+        'is_paused': paused
+    })
+    for soc in sockets.values():
+        try:
+            soc.send_frame(message, droppable=False)
+        except:
+            logging.error("Error sending message", exc_info=True)
+
+
+def broadcast_update_game(game_manager, sockets, scheduler, mode="moderate"):
+    # Updates which no pacing delay separates are delivered together, as a
+    # single update_batch frame per socket
+    pending = []  # (sockets, frame, round state, droppable) of the coming delivery
     for destination, update in game_manager.latest_messages:
-        for uuid in _parse_destination(destination, game_manager, sockets):
-            if ('hole_card' in update['message'].keys()):
-                game_manager.record_hole_card(str(uuid), update['message']['hole_card'])
-            if len(str(uuid)) <= 2:
-                # AI players
-
-                ai_player = game_manager.ai_players[uuid]
-                _broadcast_message_to_ai(ai_player, update)
-            else:
-                # Human player
-                socket = _find_socket_by_uuid(sockets, uuid)
-                message = _gen_game_update_message(handler, update, game_manager)
-                try:
-                    socket.write_message(message)
-                except:
-                    logging.error("Error sending message", exc_info=True)
-                time.sleep(_calc_wait_interval(mode, update))
+        if ('hole_card' in update['message'].keys()):
+            game_manager.record_hole_card(str(destination), update['message']['hole_card'])
+        for ai_player in _parse_ai_destination(destination, game_manager):
+            GM.broadcast_message_to_ai(ai_player, update)
+        human_sockets = _parse_human_destination(destination, game_manager, sockets)
+        if human_sockets:
+            # Broadcast updates are identical for every socket, and private ones
+            # (hole cards and asks) have a single recipient, so each update is
+            # rendered and encoded only once. The round state after the update
+            # goes along, to resync the spectators which had to skip frames.
+            # The game result is never skipped as no snapshot could replace it.
+            message_type = update['message']['message_type']
+            start_time = time.perf_counter()
+            message = gen_game_update_frame(update, game_manager)
+            MT.RENDER_SECONDS.observe(time.perf_counter() - start_time, message_type)
+        # tracked for every update, so that sockets which join later are shown the right table
+        track_update(update, game_manager)
+        if human_sockets:
+            pending.append((human_sockets, message, game_manager.latest_round_state,
+                message_type != 'game_result_message'))
+            wait_interval = _calc_wait_interval(mode, update)
+            if wait_interval > 0:
+                scheduler.schedule(functools.partial(_write_batches, _gen_batches(pending)), wait_interval)
+                pending = []
+    if pending:
+        scheduler.schedule(functools.partial(_write_batches, _gen_batches(pending)), 0)
+
+
+def track_update(update, game_manager):
+    # The latest round state is the base of the next deltas and of the
+    # snapshots, and hole cards are kept until the showdown of their round.
+    # Asks are private, so they leave the shared round state untouched.
+    message_type = update['message']['message_type']
+    if 'round_state' in update['message'] and 'ask_message' != message_type:
+        game_manager.latest_round_state = _pick_round_state(update['message']['round_state'])
+    if 'round_result_message' == message_type:
+        game_manager.reset_hole_record()
+
+
+def gen_game_update_frame(update, game_manager):
+    return tornado.escape.json_encode(_gen_game_update_message(update, game_manager))
+
+
+def _gen_batches(pending):
+    # Sockets which receive the same updates share one frame, which is
+    # deflated once for all of them
+    updates_of = OrderedDict()  # socket => indexes of its updates in pending
+    for idx, (sockets, _message, _round_state, _droppable) in enumerate(pending):
+        for socket in sockets:
+            updates_of.setdefault(socket, []).append(idx)
+    groups = OrderedDict()  # indexes of updates => sockets
+    for socket, idxs in updates_of.items():
+        groups.setdefault(tuple(idxs), []).append(socket)
+    batches = []
+    for idxs, group_sockets in groups.items():
+        entries = [pending[idx] for idx in idxs]
+        if len(entries) == 1:
+            message = entries[0][1]
+        else:
+            # the updates are already encoded, so they are joined as they are
+            message = '{"message_type": "update_batch", "messages": [%s]}' % ", ".join([entry[1] for entry in entries])
+        droppable = all([entry[3] for entry in entries])
+        batches.append((group_sockets, SF.SharedFrame(message), entries[-1][2], droppable))
+    return batches
+
+
+def _write_batches(batches):
+    for sockets, message, round_state, droppable in batches:
+        _write_message(sockets, message, round_state, droppable)
+
+
+def _write_message(sockets, message, round_state, droppable):
+    for socket in sockets:
+        try:
+            socket.send_frame(message, round_state, droppable)
+        except:
+            logging.error("Error sending message", exc_info=True)
 
 
-def _parse_destination(destination, game_manager, sockets):
+def _parse_ai_destination(destination, game_manager):
     if destination == -1:
-        return [soc.uuid for soc in sockets] + list(game_manager.ai_players.keys())
+        return list(game_manager.ai_players.values())
+    elif game_manager.is_ai_player(destination):
+        return [game_manager.ai_players[destination]]
     else:
-        return [destination]
+        return []
+
+
+def _parse_human_destination(destination, game_manager, sockets):
+    if destination == -1:
+        return list(sockets.values())
+    elif destination in sockets:
+        return [sockets[destination]]
+    else:
+        return []
+
+
+def send_game_snapshot(handler, game_manager, socket, scheduler):
+    # A socket joining a running game gets the page and the full round state
+    # once, and then follows the table through the deltas of the broadcasts.
+    # The round state already includes the updates which are still queued,
+    # so the snapshot is queued behind them, where the other sockets will
+    # have reached the same state.
+    messages = [
+            _gen_start_game_message(handler, game_manager, socket.uuid),
+            _gen_snapshot_message(game_manager.latest_round_state)
+            ]
+    scheduler.schedule(functools.partial(_write_snapshot, socket, messages), 0)
+
 
+def _write_snapshot(socket, messages):
+    try:
+        for message in messages: socket.write_message(message)
+    except:
+        logging.error("Error sending message", exc_info=True)
 
-def _find_socket_by_uuid(sockets, uuid):
-    target = [sock for sock in sockets if sock.uuid == uuid]
-    assert len(target) == 1
-    return target[0]
 
+def gen_snapshot_frame(round_state):
+    return tornado.escape.json_encode(_gen_snapshot_message(round_state))
 
-def _gen_game_update_message(handler, message, game_manager):
+
+def _gen_snapshot_message(round_state):
+    return {
+        'message_type': 'update_game',
+        'protocol': PROTOCOL_VERSION,
+        'content': {
+            'update_type': 'snapshot',
+            'delta': round_state or {},
+            'event': {}
+        }
+    }
+
+
+def _gen_game_update_message(message, game_manager):
     message_type = message['message']['message_type']
-    hole = False
-    if ('hole_card' in message['message'].keys()):
-        hole = message['message']['hole_card']
+    content = {'update_type': message_type}
 
     if 'round_start_message' == message_type:
-        round_count = message['message']['round_count']
-        hole_card = message['message']['hole_card']
-        event_html_str = handler.render_string("event_round_start.html",
-                                               round_count=round_count, hole_card=hole_card)
-        content = {
-            'update_type': message_type,
-            'event_html': tornado.escape.to_basestring(event_html_str)
+        content['event'] = {
+            'round_count': message['message']['round_count'],
+            'hole_card': message['message']['hole_card']
         }
     elif 'street_start_message' == message_type:
-        round_state = message['message']['round_state']
-        street = message['message']['street']
-        table_html_str = handler.render_string("round_state.html", round_state=round_state)
-        event_html_str = handler.render_string("event_street_start.html", street=street)
-        content = {
-            'update_type': message_type,
-            'table_html': tornado.escape.to_basestring(table_html_str),
-            'event_html': tornado.escape.to_basestring(event_html_str)
+        content['delta'] = _gen_round_state_delta(message['message']['round_state'], game_manager)
+        content['event'] = {
+            'street': message['message']['street']
         }
     elif 'game_update_message' == message_type:
-        round_state = message['message']['round_state']
-        action = message['message']['action']
-        action_histories = message['message']['action_histories']
-        table_html_str = handler.render_string("round_state.html", round_state=round_state)
-        event_html_str = handler.render_string(
-            "event_update_game.html", action=action, round_state=round_state)
-        content = {
-            'update_type': message_type,
-            'table_html': tornado.escape.to_basestring(table_html_str),
-            'event_html': tornado.escape.to_basestring(event_html_str)
+        content['delta'] = _gen_round_state_delta(message['message']['round_state'], game_manager)
+        content['event'] = {
+            'action': message['message']['action']
         }
     elif 'round_result_message' == message_type:
-        # print(repr(message['message'].items()))
         # Here, add additional field to hand_info to indicate which card to display (suit, rank)
-        # Append hand info to each winner
-        hand_info = message['message']['hand_info']
         hand_out = []
-        for hand in hand_info:
+        for hand in message['message']['hand_info']:
             if (hand['uuid'] in game_manager.hole_cards):
-                hand['hand_cards'] = game_manager.hole_cards[hand['uuid']]
-
-                # Fix spelling errors
-                if (hand['hand']['hand']['strength'] == 'FLASH'):
-                    hand['hand']['hand']['strength'] = 'FLUSH'
-
-                if (hand['hand']['hand']['strength'] == 'THREECARD'):
-                    hand['hand']['hand']['strength'] = 'THREE OF A KIND'
-
-                if (hand['hand']['hand']['strength'] == 'ONEPAIR'):
-                    hand['hand']['hand']['strength'] = 'PAIR'
-
-                if (hand['hand']['hand']['strength'] == 'TWOPAIR'):
-                    hand['hand']['hand']['strength'] = 'TWO PAIR'
-
-                if (hand['hand']['hand']['strength'] == 'HIGHCARD'):
-                    hand['hand']['hand']['strength'] = 'HIGH CARD'
-                hand_out.append(hand)
+                strength = hand['hand']['hand']['strength']
+                hand_out.append({
+                    'uuid': hand['uuid'],
+                    'hand_cards': game_manager.hole_cards[hand['uuid']],
+                    # Fix spelling errors
+                    'strength': HAND_STRENGTH_NAMES.get(strength, strength)
+                })
             else:
                 print(f"UUID {hand['uuid']} does NOT exist in hole cards...")
                 raise (KeyError)
-        hand_info = hand_out
-        round_state = message['message']['round_state']
-
-        winners = message['message']['winners']
-        round_count = message['message']['round_count']
-        table_html_str = handler.render_string("round_state.html", round_state=round_state)
-        event_html_str = handler.render_string("event_round_result.html",
-                                               round_state=round_state, hand_info=hand_info, winners=winners,
-                                               round_count=round_count)
-        content = {
-            'update_type': message_type,
-            'table_html': tornado.escape.to_basestring(table_html_str),
-            'event_html': tornado.escape.to_basestring(event_html_str)
+        content['delta'] = _gen_round_state_delta(message['message']['round_state'], game_manager)
+        content['event'] = {
+            'round_count': message['message']['round_count'],
+            'winners': message['message']['winners'],
+            'hand_info': hand_out
         }
-        # Reset hands
-        game_manager.reset_hole_record()
     elif 'game_result_message' == message_type:
-        game_info = message['message']['game_information']
-        event_html_str = handler.render_string("event_game_result.html", game_information=game_info)
-        content = {
-            'update_type': message_type,
-            'event_html': tornado.escape.to_basestring(event_html_str)
+        content['event'] = {
+            'seats': message['message']['game_information']['seats']
         }
     elif 'ask_message' == message_type:
-        round_state = message['message']['round_state']
-        hole_card = message['message']['hole_card']
-        valid_actions = message['message']['valid_actions']
-        action_histories = message['message']['action_histories']
-        table_html_str = handler.render_string("round_state.html", round_state=round_state)
-        event_html_str = handler.render_string("event_ask_action.html",
-                                               hole_card=hole_card, valid_actions=valid_actions,
-                                               action_histories=action_histories)
-        content = {
-            'update_type': message_type,
-            'table_html': tornado.escape.to_basestring(table_html_str),
-            'event_html': tornado.escape.to_basestring(event_html_str)
+        # Asks are private, so they leave the shared round state untouched
+        content['event'] = {
+            'hole_card': message['message']['hole_card'],
+            'valid_actions': message['message']['valid_actions']
         }
     else:
         raise Exception("Unexpected message received : %r" % message)
 
     return {
         'message_type': 'update_game',
+        'protocol': PROTOCOL_VERSION,
         'content': content
     }
 
 
-def _broadcast_message_to_ai(ai_player, message):
-    message_type = message['message']['message_type']
-    hole = False
-    if ('hole_card' in message['message'].keys()):
-        hole = message['message']['hole_card']
-    if 'round_start_message' == message_type:
-        round_count = message['message']['round_count']
-        hole_card = message['message']['hole_card']
-        seats = message['message']['seats']
-        ai_player.receive_round_start_message(round_count, hole_card, seats)
-    elif 'street_start_message' == message_type:
-        street = message['message']['street']
-        round_state = message['message']['round_state']
-        ai_player.receive_street_start_message(street, round_state)
-    elif 'game_update_message' == message_type:
-        action = message['message']['action']
-        round_state = message['message']['round_state']
-        ai_player.receive_game_update_message(action, round_state)
-    elif 'round_result_message' == message_type:
-        winners = message['message']['winners']
-        round_state = message['message']['round_state']
-        hand_info = message['message']['hand_info']
-        if (hole):
-            print(hole)
-        ai_player.receive_round_result_message(winners, hand_info, round_state)
-    elif 'game_result_message' == message_type:
-        pass  # ai does not handle game result
-    elif 'ask_message' == message_type:
-        pass  # ask message handling is done in global_game_config.ask_action_to_ai
-    else:
-        raise Exception("Unexpected message received : %r" % message)
+def _gen_round_state_delta(round_state, game_manager):
+    previous = game_manager.latest_round_state or {}
+    current = _pick_round_state(round_state)
+    delta = {}
+    for key in ROUND_STATE_KEYS:
+        if previous.get(key) == current[key]:
+            continue
+        if key == 'seats' and len(previous.get(key, [])) == len(current[key]):
+            # only the seats which changed, keyed by their position
+            delta[key] = {str(idx): seat for idx, (old, seat)
+                          in enumerate(zip(previous[key], current[key])) if old != seat}
+        else:
+            delta[key] = current[key]
+    return delta
+
+
+def _pick_round_state(round_state):
+    return {key: round_state[key] for key in ROUND_STATE_KEYS}
 
 
 def _calc_wait_interval(mode, update):
@@ -272,6 +331,21 @@ def _calc_wait_interval(mode, update):
         raise Exception("Unexpected mode received [ %s ]" % mode)
 
 
+PROTOCOL_VERSION = 2
+
+# Keys of round_state which the client needs to draw the table
+ROUND_STATE_KEYS = [
+    'round_count', 'street', 'next_player', 'dealer_btn', 'community_card', 'pot', 'seats'
+]
+
+HAND_STRENGTH_NAMES = {
+    'FLASH': 'FLUSH',
+    'THREECARD': 'THREE OF A KIND',
+    'ONEPAIR': 'PAIR',
+    'TWOPAIR': 'TWO PAIR',
+    'HIGHCARD': 'HIGH CARD'
+}
+
 SLOW_WAIT_INTERVAL = {
     'round_start_message': 5,
     'street_start_message': 4,
@@ -0,0 +1,98 @@
+import bisect
+from collections import OrderedDict
+
+"""Prometheus style metrics of the server, served as text on /metrics.
+    Only the two kinds the server needs are implemented, so no client
+    library is required: histograms, which count observations into fixed
+    buckets per label values, and gauges, whose value is read from a
+    callback when the metrics are scraped.
+"""
+class Histogram(object):
+
+    def __init__(self, name, help_text, label_names=(), buckets=None):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self.buckets = list(buckets or DEFAULT_BUCKETS)
+        self.series = OrderedDict()  # label values => [bucket counts, count, sum]
+
+    def observe(self, value, *label_values):
+        assert len(label_values) == len(self.label_names)
+        if label_values not in self.series:
+            self.series[label_values] = [[0] * len(self.buckets), 0, 0.0]
+        series = self.series[label_values]
+        idx = bisect.bisect_left(self.buckets, value)
+        if idx < len(self.buckets): series[0][idx] += 1
+        series[1] += 1
+        series[2] += value
+
+    def expose(self):
+        lines = ["# HELP %s %s" % (self.name, self.help_text), "# TYPE %s histogram" % self.name]
+        for label_values, (bucket_counts, count, total) in self.series.items():
+            labels = list(zip(self.label_names, label_values))
+            cumulative = 0
+            for upper_bound, bucket_count in zip(self.buckets, bucket_counts):
+                cumulative += bucket_count
+                lines.append("%s_bucket%s %d" % (self.name, _format_labels(labels + [("le", repr(float(upper_bound)))]), cumulative))
+            lines.append("%s_bucket%s %d" % (self.name, _format_labels(labels + [("le", "+Inf")]), count))
+            lines.append("%s_count%s %d" % (self.name, _format_labels(labels), count))
+            lines.append("%s_sum%s %r" % (self.name, _format_labels(labels), total))
+        return lines
+
+
+class Gauge(object):
+
+    def __init__(self, name, help_text, read):
+        self.name = name
+        self.help_text = help_text
+        self.read = read
+
+    def expose(self):
+        return ["# HELP %s %s" % (self.name, self.help_text), "# TYPE %s gauge" % self.name,
+                "%s %r" % (self.name, float(self.read()))]
+
+
+class MetricsRegistry(object):
+
+    def __init__(self):
+        self.metrics = OrderedDict()  # name => metric
+
+    def histogram(self, name, help_text, label_names=(), buckets=None):
+        self.metrics[name] = Histogram(name, help_text, label_names, buckets)
+        return self.metrics[name]
+
+    def gauge(self, name, help_text, read):
+        # registering a gauge again replaces its callback
+        self.metrics[name] = Gauge(name, help_text, read)
+        return self.metrics[name]
+
+    def expose(self):
+        lines = []
+        for metric in self.metrics.values():
+            lines += metric.expose()
+        return "\n".join(lines) + "\n"
+
+
+def _format_labels(labels):
+    if not labels: return ""
+    return "{%s}" % ",".join(['%s="%s"' % (name, _escape_label_value(value)) for name, value in labels])
+
+def _escape_label_value(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+# seconds, from 100us to 10s
+DEFAULT_BUCKETS = [0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10]
+
+global_metrics = MetricsRegistry()
+
+AI_DECISION_SECONDS = global_metrics.histogram(
+        "pypokergui_ai_decision_seconds", "Time taken by a bot to declare its action", ["bot"])
+ENGINE_UPDATE_SECONDS = global_metrics.histogram(
+        "pypokergui_engine_update_seconds", "Time taken by the engine to apply an action")
+RENDER_SECONDS = global_metrics.histogram(
+        "pypokergui_render_seconds", "Time taken to build a message for the browser", ["message_type"])
+TEMPLATE_RENDER_SECONDS = global_metrics.histogram(
+        "pypokergui_template_render_seconds", "Time taken to render a template", ["template"])
+WEBSOCKET_SEND_SECONDS = global_metrics.histogram(
+        "pypokergui_websocket_send_seconds", "Time until a websocket frame was handed to the OS")
@@ -0,0 +1,90 @@
+import time
+import logging
+from collections import deque
+
+import tornado.websocket
+
+"""Bounded outbound queue of a spectator socket.
+    Frames are written one at a time, and the next one is written only after
+    tornado has handed the previous one to the OS, so a slow connection
+    backs up here instead of in tornado's unbounded write buffer.
+
+    When the queued frames would exceed max_bytes, the queued round updates
+    are dropped as stale, and once the queue has drained the spectator gets
+    a single snapshot of the round state after the last dropped frame.
+    Frames which cannot be rebuilt from the round state (the game page and
+    config updates) are never dropped. A socket which has not caught up
+    within max_lag seconds of its first overflow is closed.
+"""
+class SpectatorOutbox(object):
+
+    def __init__(self, socket, gen_snapshot_frame, max_bytes, max_lag):
+        self.socket = socket
+        self.gen_snapshot_frame = gen_snapshot_frame
+        self.max_bytes = max_bytes
+        self.max_lag = max_lag
+        self.frames = deque()  # (frame, droppable)
+        self.queued_bytes = 0
+        self.writing = False
+        self.lagging_since = None
+        self.needs_snapshot = False
+        self.round_state = None
+        self.closed = False
+
+    def push(self, frame, round_state=None, droppable=True):
+        if self.closed: return
+        if round_state is not None: self.round_state = round_state
+        if self.lagging_since and time.time() - self.lagging_since > self.max_lag:
+            logging.warning("Disconnecting spectator [ %s ] which keeps lagging behind" % self.socket.uuid)
+            self.close()
+            self.socket.close()
+            return
+        if droppable and self.needs_snapshot:
+            return  # the coming snapshot already includes this update
+        if self.queued_bytes + len(frame) > self.max_bytes:
+            self.lagging_since = self.lagging_since or time.time()
+            dropped = self._drop_stale_frames() + (1 if droppable else 0)
+            # without a round state the snapshot would be empty and wipe the table
+            if dropped and self.round_state is not None: self.needs_snapshot = True
+            if droppable: return
+        self.frames.append((frame, droppable))
+        self.queued_bytes += len(frame)
+        self._write_next()
+
+    def close(self):
+        self.closed = True
+        self.frames.clear()
+        self.queued_bytes = 0
+
+    def _drop_stale_frames(self):
+        kept = deque([(frame, droppable) for frame, droppable in self.frames if not droppable])
+        dropped = len(self.frames) - len(kept)
+        self.frames = kept
+        self.queued_bytes = sum([len(frame) for frame, _droppable in self.frames])
+        return dropped
+
+    def _write_next(self):
+        if self.writing or self.closed: return
+        if self.frames:
+            frame, _droppable = self.frames.popleft()
+            self.queued_bytes -= len(frame)
+        elif self.needs_snapshot:
+            frame = self.gen_snapshot_frame(self.round_state)
+            self.needs_snapshot = False
+        else:
+            self.lagging_since = None  # caught up
+            return
+        try:
+            future = self.socket.write_message(frame)
+        except tornado.websocket.WebSocketClosedError:
+            self.close()
+            return
+        self.writing = True
+        future.add_done_callback(self._on_written)
+
+    def _on_written(self, future):
+        self.writing = False
+        if future.exception():
+            self.close()
+            return
+        self._write_next()
@@ -6,88 +6,180 @@ src_path = os.path.join(root, "pypokergui")
 sys.path.append(root)
 sys.path.append(src_path)
 
+import time
 import yaml
 import uuid
 import tornado.ioloop
 import tornado.options
 import tornado.web
+import tornado.template
 import tornado.websocket
 from tornado.options import define, options
 
 import pypokerengine.utils.action_utils as AU
 
-import pypokergui.server.game_manager as GM
 import pypokergui.server.message_manager as MM
+import pypokergui.server.table_manager as TM
+import pypokergui.server.render_timer as RT
+import pypokergui.server.hand_recorder as HR
+import pypokergui.server.outbox as OB
+import pypokergui.server.shared_frame as SF
+import pypokergui.server.metrics as MT
 
 define("port", default=8888, help="run on the given port", type=int)
 define("config", default=None, help="path to game config", type=str)
 define("speed", default="moderate", help="how fast game progress", type=str)
+define("production", default=False, help="run without debug machinery", type=bool)
+define("record", default=None, help="path of the hand history log", type=str)
 
 
 class Application(tornado.web.Application):
 
-    def __init__(self):
+    def __init__(self, production, compression_level, compression_min_size):
         handlers = [
-            (r"/", PokerRequestHandler),
-            (r"/pokersocket", PokerWebSocketHandler),
+            (r"/", LobbyRequestHandler),
+            (r"/tables", TableCreateHandler),
+            (r"/tables/(\w+)/delete", TableDeleteHandler),
+            (r"/table/(\w+)", PokerRequestHandler),
+            (r"/pokersocket/(\w+)", PokerWebSocketHandler),
+            (r"/metrics", MetricsHandler),
         ]
+        template_path = os.path.join(os.path.dirname(__file__), "templates")
         settings = dict(
             cookie_secret="__TODO:_GENERATE_YOUR_OWN_RANDOM_VALUE_HERE__",
-            template_path=os.path.join(os.path.dirname(__file__), "templates"),
+            template_path=template_path,
             static_path=os.path.join(os.path.dirname(__file__), "static"),
             xsrf_cookies=True,
+            compression_level=compression_level,
+            compression_min_size=compression_min_size,
         )
-        super(Application, self).__init__(handlers, debug=True, **settings)
+        if production:
+            # Without debug, templates are compiled once and cached, static_url
+            # hashes are cached and versioned assets are served with long-lived
+            # cache headers. Autoreload and served tracebacks are off too.
+            settings["template_loader"] = _compile_templates(template_path)
+        super(Application, self).__init__(handlers, debug=not production, **settings)
 
 
-class PokerRequestHandler(tornado.web.RequestHandler):
+def _compile_templates(template_path):
+    loader = tornado.template.Loader(template_path)
+    for template_name in os.listdir(template_path):
+        if template_name.endswith(".html"):
+            loader.load(template_name)
+    return loader
+
+
+class LobbyRequestHandler(RT.TimedRenderMixin, tornado.web.RequestHandler):
 
     def get(self):
-        self.render("index.html", config=global_game_manager, registered=False)
+        self.render("lobby.html", tables=global_table_registry.list_tables())
 
 
-class PokerWebSocketHandler(tornado.websocket.WebSocketHandler):
-    sockets = set()
+class TableCreateHandler(tornado.web.RequestHandler):
 
-    def get_compression_options(self):
-        # Non-None enables compression with default options.
-        return {}
+    def post(self):
+        table = global_table_registry.create_table()
+        self.redirect("/table/%s" % table.table_id)
+
+
+class TableDeleteHandler(tornado.web.RequestHandler):
+
+    def post(self, table_id):
+        global_table_registry.remove_table(table_id)
+        self.redirect("/")
+
+
+class MetricsHandler(tornado.web.RequestHandler):
+
+    def get(self):
+        self.set_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.write(MT.global_metrics.expose())
 
-    def open(self):
+
+class PokerRequestHandler(RT.TimedRenderMixin, tornado.web.RequestHandler):
+
+    def get(self, table_id):
+        table = global_table_registry.get_table(table_id)
+        if not table:
+            raise tornado.web.HTTPError(404)
+        self.render("index.html", config=table.game_manager, registered=False, table_id=table_id)
+
+
+class PokerWebSocketHandler(RT.TimedRenderMixin, tornado.websocket.WebSocketHandler):
+
+    def get_compression_options(self):
+        # Non-None enables compression, level 0 turns it off
+        if self.settings["compression_level"] == 0: return None
+        return { "compression_level": self.settings["compression_level"] }
+
+    def write_message(self, message, binary=False):
+        # Every text frame is deflated on its own by write_frame, so that
+        # shared frames are compressed once for all of their recipients
+        if binary:
+            return super(PokerWebSocketHandler, self).write_message(message, binary)
+        if not isinstance(message, SF.SharedFrame):
+            message = SF.SharedFrame(message)
+        start_time = time.perf_counter()
+        future = SF.write_frame(self, message,
+                self.settings["compression_level"], self.settings["compression_min_size"])
+        future.add_done_callback(
+                lambda _future: MT.WEBSOCKET_SEND_SECONDS.observe(time.perf_counter() - start_time))
+        return future
+
+    def open(self, table_id):
         self.uuid = str(uuid.uuid4())
-        PokerWebSocketHandler.sockets.add(self)
+        self.table = global_table_registry.get_table(table_id)
+        if not self.table:
+            self.close()
+            return
+        self.outbox = OB.SpectatorOutbox(self, MM.gen_snapshot_frame,
+                SPECTATOR_MAX_BYTES, SPECTATOR_MAX_LAG)
+        self.table.join_socket(self)
+        if self.table.game_manager.is_playing_poker:
+            MM.send_game_snapshot(self, self.table.game_manager, self, self.table.scheduler)
 
     def on_close(self):
-        PokerWebSocketHandler.sockets.remove(self)
-        if global_game_manager.get_human_player_info(self.uuid):
-            global_game_manager.remove_human_player_info(self.uuid)
-            MM.broadcast_config_update(self, global_game_manager, self.sockets)
+        if not self.table: return
+        self.outbox.close()
+        self.table.leave_socket(self)
+        game_manager = self.table.game_manager
+        if game_manager.get_human_player_info(self.uuid):
+            game_manager.remove_human_player_info(self.uuid)
+            MM.broadcast_config_update(self, game_manager, self.table.sockets)
+        if self.table.has_game_finished() and not self.table.sockets:
+            global_table_registry.remove_table(self.table.table_id)
+
+    def send_frame(self, frame, round_state=None, droppable=True):
+        # Players get every frame as they must not miss an ask. Spectators
+        # go through their bounded outbox, so a slow one can't pile up
+        # frames in server memory.
+        if self.table.game_manager.get_human_player_info(self.uuid):
+            self.write_message(frame)
+        else:
+            self.outbox.push(frame, round_state, droppable)
 
     def on_connection_close(self):
         print(f"Connection closed: {self.uuid}")
+        super(PokerWebSocketHandler, self).on_connection_close()
 
     def on_message(self, message):
         js = tornado.escape.json_decode(message)
         message_type = js['type']
+        game_manager = self.table.game_manager
         if 'action_new_member' == message_type:
-            global_game_manager.join_human_player(js['name'], self.uuid)
-            MM.broadcast_config_update(self, global_game_manager, self.sockets)
+            game_manager.join_human_player(js['name'], self.uuid)
+            MM.broadcast_config_update(self, game_manager, self.table.sockets)
         elif 'action_start_game' == message_type:
-            if global_game_manager.is_playing_poker:
-                MM.alert_server_restart(self, self.uuid, self.sockets)
+            if game_manager.is_playing_poker or self.table.game_loop:
+                MM.alert_server_restart(self, self.uuid, self.table.sockets)
             else:
-                global_game_manager.start_game()
-                MM.broadcast_start_game(self, global_game_manager, self.sockets)
-                MM.broadcast_update_game(self, global_game_manager, self.sockets, MODE_SPEED)
-                if self._is_next_player_ai(global_game_manager):
-                    self._progress_the_game_till_human()
+                self.table.start_game_loop(self, MODE_SPEED)
         elif 'action_declare_action' == message_type:
-            if self.uuid == global_game_manager.next_player_uuid:
-                action, amount = self._correct_action(js)
-                global_game_manager.update_game(action, amount)
-                MM.broadcast_update_game(self, global_game_manager, self.sockets, MODE_SPEED)
-                if self._is_next_player_ai(global_game_manager):
-                    self._progress_the_game_till_human()
+            if self.uuid == game_manager.next_player_uuid:
+                self.table.game_loop.declare_action(self.uuid, *self._correct_action(js))
+        elif 'action_toggle_pause' == message_type:
+            if self.table.game_loop and game_manager.get_human_player_info(self.uuid):
+                self.table.game_loop.toggle_pause()
         else:
             raise Exception("Unexpected message [ %r ] received" % message)
 
@@ -96,9 +188,10 @@ class PokerWebSocketHandler(tornado.websocket.WebSocketHandler):
             data["amount"] = int(data["amount"])
         except:
             data["amount"] = -1
-        players = global_game_manager.engine.current_state["table"].seats.players
-        next_player_pos = global_game_manager.engine.current_state["next_player"]
-        sb_amount = global_game_manager.engine.current_state["small_blind_amount"]
+        current_state = self.table.game_manager.engine.current_state
+        players = current_state["table"].seats.players
+        next_player_pos = current_state["next_player"]
+        sb_amount = current_state["small_blind_amount"]
         actions = AU.generate_legal_actions(players, next_player_pos, sb_amount)
 
         if data["action"] == "fold":
@@ -114,47 +207,46 @@ class PokerWebSocketHandler(tornado.websocket.WebSocketHandler):
                 data["amount"] = 0
         return data["action"], data["amount"]
 
-    def _progress_the_game_till_human(self):
-        while self._is_next_player_ai(global_game_manager):
-            if GM.has_game_finished(global_game_manager.latest_messages): break
-            action, amount = global_game_manager.ask_action_to_ai_player(
-                global_game_manager.next_player_uuid)
-            global_game_manager.update_game(action, amount)
-            MM.broadcast_update_game(self, global_game_manager, self.sockets, MODE_SPEED)
-
-    def _is_next_player_ai(self, game_manager):
-        uuid = game_manager.next_player_uuid
-        return uuid and len(uuid) <= 2
-
 
 MODE_SPEED = "moderate"
-global_game_manager = GM.GameManager()
+RENDER_REPORT_INTERVAL = 60  # sec
+SPECTATOR_MAX_BYTES = 256 * 1024
+SPECTATOR_MAX_LAG = 30  # sec
+DEFAULT_COMPRESSION_LEVEL = 6
+DEFAULT_COMPRESSION_MIN_SIZE = 256  # bytes
+global_table_registry = None
 
 
-def setup_config(config):
-    global_game_manager.define_rule(
-        config['max_round'], config['initial_stack'], config['small_blind'],
-        config['ante'], config['blind_structure']
-    )
-    for player in config['ai_players']:
-        global_game_manager.join_ai_player(player['name'], player['path'])
+def setup_table_registry(config, recorder=None):
+    global global_table_registry
+    global_table_registry = TM.TableRegistry(config, recorder)
+    global_table_registry.create_table()
+    MT.global_metrics.gauge("pypokergui_tables", "Tables hosted by the server",
+            lambda: len(global_table_registry.tables))
+    MT.global_metrics.gauge("pypokergui_connected_sockets", "Websockets connected to a table",
+            lambda: sum([len(table.sockets) for table in global_table_registry.list_tables()]))
 
 
-def start_server(config_path, port, speed):
+def start_server(config_path, port, speed, production=False, record_path=None):
     global MODE_SPEED
     print(config_path)
     with open(config_path, "rb") as f:
         config = yaml.load(f, Loader=yaml.SafeLoader)
-    setup_config(config)
+    recorder = HR.HandRecorder(record_path) if record_path else None
+    setup_table_registry(config, recorder)
     MODE_SPEED = speed
-    app = Application()
+    app = Application(production,
+            config.get('compression_level', DEFAULT_COMPRESSION_LEVEL),
+            config.get('compression_min_size', DEFAULT_COMPRESSION_MIN_SIZE))
     app.listen(port)
+    tornado.ioloop.PeriodicCallback(
+        RT.global_render_timer.print_report_if_updated, RENDER_REPORT_INTERVAL * 1000).start()
     tornado.ioloop.IOLoop.current().start()
 
 
 def main():
     tornado.options.parse_command_line()
-    start_server(options.config, options.port, options.speed)
+    start_server(options.config, options.port, options.speed, options.production, options.record)
 
 
 if __name__ == '__main__':
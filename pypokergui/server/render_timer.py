@@ -0,0 +1,52 @@
+import time
+from collections import OrderedDict
+
+import pypokergui.server.metrics as MT
+
+
+class RenderTimer(object):
+    """Accumulate how long each template takes to render.
+
+    The summary is printed periodically by the server, so the cost of
+    rendering can be compared between the debug and production modes.
+    """
+
+    def __init__(self):
+        self.timings = OrderedDict()
+        self.updated = False
+
+    def record(self, template_name, elapsed):
+        if template_name not in self.timings:
+            self.timings[template_name] = { "count": 0, "total": 0.0, "max": 0.0 }
+        timing = self.timings[template_name]
+        timing["count"] += 1
+        timing["total"] += elapsed
+        timing["max"] = max(timing["max"], elapsed)
+        self.updated = True
+        MT.TEMPLATE_RENDER_SECONDS.observe(elapsed, template_name)
+
+    def report(self):
+        lines = ["%-20s %8s %10s %10s" % ("template", "count", "avg(ms)", "max(ms)")]
+        for template_name, timing in self.timings.items():
+            lines.append("%-20s %8d %10.3f %10.3f" % (
+                template_name, timing["count"],
+                timing["total"] / timing["count"] * 1000, timing["max"] * 1000))
+        return "\n".join(lines)
+
+    def print_report_if_updated(self):
+        if not self.updated: return
+        self.updated = False
+        print(self.report())
+
+
+class TimedRenderMixin(object):
+    """Record the render time of every template rendered by a handler"""
+
+    def render_string(self, template_name, **kwargs):
+        start_time = time.perf_counter()
+        html = super(TimedRenderMixin, self).render_string(template_name, **kwargs)
+        global_render_timer.record(template_name, time.perf_counter() - start_time)
+        return html
+
+
+global_render_timer = RenderTimer()
@@ -0,0 +1,291 @@
+import os
+import array
+import hashlib
+import struct
+import logging
+
+import tornado.ioloop
+import tornado.web
+import tornado.escape
+import tornado.websocket
+
+from pypokerengine.engine.card import Card
+from pypokerengine.engine.deck import Deck
+from pypokerengine.engine.table import Table
+from pypokerengine.engine.player import Player
+from pypokerengine.engine.round_manager import RoundManager
+
+import pypokergui.server.message_manager as MM
+
+"""Replay the hand histories written by hand_recorder in the browser.
+    No bot is loaded: each recorded hand is dealt again from a cheat deck
+    holding its hole cards and board, and its actions are applied through
+    RoundManager, which gives back the engine messages of the hand. These
+    are turned into the same update_game frames the live server sends, so
+    poker.js draws them as usual.
+
+    The byte offset of every hand is kept in an index file next to the log
+    (<log>.idx), so any hand can be read without scanning the log. The index
+    is extended when the log has grown since it was written, and rebuilt
+    when the log is not the one it was written for.
+"""
+class HandLog(object):
+
+    def __init__(self, log_path):
+        self.log_path = log_path
+        self.offsets = load_hand_index(log_path)
+
+    def hand_count(self):
+        return len(self.offsets)
+
+    def read_hand(self, hand_idx):
+        with open(self.log_path, "rb") as f:
+            f.seek(self.offsets[hand_idx])
+            return tornado.escape.json_decode(f.readline())
+
+
+def load_hand_index(log_path):
+    index_path = log_path + ".idx"
+    log_size = os.path.getsize(log_path)
+    log_id = _gen_log_id(log_path)
+    offsets, indexed_size = array.array("Q"), 0
+    if os.path.exists(index_path):
+        with open(index_path, "rb") as f:
+            header = f.read(struct.calcsize(INDEX_HEADER_FORMAT))
+            body = f.read()
+        if len(header) == struct.calcsize(INDEX_HEADER_FORMAT):
+            magic, indexed_size, indexed_log_id = struct.unpack(INDEX_HEADER_FORMAT, header)
+        else:
+            magic = None
+        if magic != INDEX_MAGIC or indexed_log_id != log_id or indexed_size > log_size:
+            # not ours, or the log was rotated or replaced
+            indexed_size = 0
+        else:
+            offsets.frombytes(body)
+    if indexed_size < log_size:
+        with open(log_path, "rb") as f:
+            f.seek(indexed_size)
+            offset = indexed_size
+            for line in f:
+                # a partly written last line is left for the next time
+                if not line.endswith(b"\n"): break
+                offsets.append(offset)
+                offset += len(line)
+        with open(index_path, "wb") as f:
+            f.write(struct.pack(INDEX_HEADER_FORMAT, INDEX_MAGIC, offset, log_id))
+            f.write(offsets.tobytes())
+    return offsets
+
+
+def _gen_log_id(log_path):
+    # A rotated log starts over with another hand, so the digest of the
+    # first line tells it from the log which was indexed
+    with open(log_path, "rb") as f:
+        return hashlib.sha1(f.readline()).digest()
+
+
+def deal_recorded_hand(hand):
+    """Play the recorded hand through the engine and return its messages"""
+    card_ids = []
+    for seat in hand['seats']:
+        card_ids += [Card.from_str(card).to_id() for card in hand['hole_cards'][seat['uuid']]]
+    card_ids += [Card.from_str(card).to_id() for card in hand['board']]
+    table = Table(cheat_deck=Deck(cheat=True, cheat_card_ids=card_ids))
+    for seat in hand['seats']:
+        player = Player(seat['uuid'], seat['stack'], seat['name'])
+        if seat['stack'] == 0: player.pay_info.update_to_fold()
+        table.seats.sitdown(player)
+    table.dealer_btn = hand['dealer_btn']
+    table.set_blind_pos(hand['small_blind_pos'], hand['big_blind_pos'])
+    state, messages = RoundManager.start_new_round(
+            hand['round_count'], hand['small_blind_amount'], hand['ante'], table)
+    for action in hand['actions']:
+        state, new_messages = RoundManager.apply_action(state, action['action'], action['amount'])
+        messages += new_messages
+    return messages
+
+
+def gen_replay_frames(hand, mode):
+    """(frame, wait_interval) of a hand, as the live server would send them to a spectator"""
+    view = ReplayView()
+    view.hole_cards = dict(hand['hole_cards'])
+    frames = []
+    for destination, update in deal_recorded_hand(hand):
+        message_type = update['message']['message_type']
+        if 'round_start_message' == message_type:
+            # a single frame showing every hole card instead of one per player
+            if not frames: frames.append((_gen_round_start_frame(hand), MM._calc_wait_interval(mode, update)))
+        elif destination == -1:
+            frames.append((MM.gen_game_update_frame(update, view), MM._calc_wait_interval(mode, update)))
+        MM.track_update(update, view)
+    return frames
+
+
+def _gen_round_start_frame(hand):
+    names = { seat['uuid']: seat['name'] for seat in hand['seats'] }
+    return tornado.escape.json_encode({
+        'message_type': 'update_game',
+        'protocol': MM.PROTOCOL_VERSION,
+        'content': {
+            'update_type': 'round_start_message',
+            'event': {
+                'round_count': hand['round_count'],
+                'hole_cards': [{ 'name': names[uuid], 'hole_card': hole_card }
+                    for uuid, hole_card in hand['hole_cards'].items()]
+            }
+        }
+    })
+
+
+class ReplayView(object):
+    """The part of GameManager which message_manager reads to build frames"""
+
+    def __init__(self):
+        self.hole_cards = {}
+        self.latest_round_state = None
+
+    def reset_hole_record(self):
+        self.hole_cards = {}
+
+
+class ReplaySession(object):
+    """Play, pause, speed and position of the replay watched by one socket"""
+
+    def __init__(self, socket, hand_log, mode):
+        self.socket = socket
+        self.hand_log = hand_log
+        self.mode = mode
+        self.speed = 1.0
+        self.playing = False
+        self.hand_idx = 0
+        self.frames = []
+        self.frame_idx = 0
+        self.timeout = None
+
+    def play(self):
+        if self.playing: return
+        self.playing = True
+        self._step()
+
+    def pause(self):
+        self.playing = False
+        self._cancel_timeout()
+
+    def set_speed(self, speed):
+        assert speed > 0
+        self.speed = speed
+
+    def jump(self, hand_idx):
+        if self.hand_log.hand_count() == 0: return
+        self._cancel_timeout()
+        self.hand_idx = min(max(0, hand_idx), self.hand_log.hand_count() - 1)
+        self.frames = gen_replay_frames(self.hand_log.read_hand(self.hand_idx), self.mode)
+        self.frame_idx = 0
+        self.send_status()
+        if self.playing:
+            self._step()
+        else:
+            # show the hole cards and the table of the new hand
+            for _ in range(min(2, len(self.frames))): self._send_next_frame()
+
+    def close(self):
+        self.pause()
+
+    def send_status(self):
+        self.socket.write_message({
+            'message_type': 'replay_status',
+            'hand': self.hand_idx + 1,
+            'hand_count': self.hand_log.hand_count(),
+            'playing': self.playing,
+            'speed': self.speed
+        })
+
+    def _step(self):
+        self.timeout = None
+        if not self.playing: return
+        if self.frame_idx == len(self.frames):
+            if self.hand_idx + 1 >= self.hand_log.hand_count():
+                self.pause()
+                self.send_status()
+                return
+            self.jump(self.hand_idx + 1)
+            return
+        wait_interval = self._send_next_frame()
+        self.timeout = tornado.ioloop.IOLoop.current().call_later(wait_interval / self.speed, self._step)
+
+    def _send_next_frame(self):
+        frame, wait_interval = self.frames[self.frame_idx]
+        self.frame_idx += 1
+        try:
+            self.socket.write_message(frame)
+        except tornado.websocket.WebSocketClosedError:
+            self.pause()
+        return wait_interval
+
+    def _cancel_timeout(self):
+        if self.timeout:
+            tornado.ioloop.IOLoop.current().remove_timeout(self.timeout)
+            self.timeout = None
+
+
+class ReplayApplication(tornado.web.Application):
+
+    def __init__(self, hand_log, mode):
+        self.hand_log = hand_log
+        self.mode = mode
+        handlers = [
+            (r"/", ReplayRequestHandler),
+            (r"/pokersocket/(\w+)", ReplayWebSocketHandler),
+        ]
+        settings = dict(
+            template_path=os.path.join(os.path.dirname(__file__), "templates"),
+            static_path=os.path.join(os.path.dirname(__file__), "static"),
+        )
+        super(ReplayApplication, self).__init__(handlers, **settings)
+
+
+class ReplayRequestHandler(tornado.web.RequestHandler):
+
+    def get(self):
+        self.render("replay.html", table_id="replay")
+
+
+class ReplayWebSocketHandler(tornado.websocket.WebSocketHandler):
+
+    def open(self, _table_id):
+        self.session = ReplaySession(self, self.application.hand_log, self.application.mode)
+        self.session.send_status()
+        self.session.jump(0)
+
+    def on_close(self):
+        self.session.close()
+
+    def on_message(self, message):
+        js = tornado.escape.json_decode(message)
+        if js.get('type') != 'replay_control':
+            raise Exception("Unexpected message [ %r ] received" % message)
+        command = js['command']
+        if 'play' == command:
+            self.session.play()
+        elif 'pause' == command:
+            self.session.pause()
+        elif 'speed' == command:
+            self.session.set_speed(float(js['value']))
+        elif 'jump' == command:
+            self.session.jump(int(js['value']) - 1)
+            return
+        else:
+            logging.error("Unexpected replay command [ %s ]" % command)
+        self.session.send_status()
+
+
+def start_replay_server(log_path, port, speed):
+    hand_log = HandLog(log_path)
+    print("%d hands indexed in [ %s ]" % (hand_log.hand_count(), log_path))
+    app = ReplayApplication(hand_log, speed)
+    app.listen(port)
+    tornado.ioloop.IOLoop.current().start()
+
+
+INDEX_MAGIC = b"PPGIDX02"
+INDEX_HEADER_FORMAT = "<8sQ20s"  # magic, indexed size of the log, sha1 of its first line
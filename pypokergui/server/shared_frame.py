@@ -0,0 +1,83 @@
+import zlib
+import asyncio
+
+import tornado.escape
+import tornado.websocket
+from tornado.iostream import StreamClosedError
+
+"""Websocket text frames which are encoded and deflated once for every
+    socket they are sent to.
+    Tornado's permessage-deflate keeps one compression context per socket,
+    so the same broadcast is compressed again for each of them, and the
+    bytes differ between sockets. write_frame() deflates every message on
+    its own instead (as with server_no_context_takeover, which RFC 7692
+    lets the server use whether or not it was negotiated), so the deflated
+    payload of a SharedFrame is cached and the same bytes go to every
+    recipient.
+
+    A socket must send all of its text frames through write_frame(), since
+    frames from tornado's own compressor could refer back to a context the
+    client never saw.
+
+    write_frame() builds the frame through internals of tornado's websocket
+    protocol. On a tornado release which lacks them, it falls back to the
+    plain write_message of the socket, which then compresses every frame
+    with tornado's own compressor.
+"""
+class SharedFrame(object):
+
+    def __init__(self, message):
+        if isinstance(message, dict):
+            message = tornado.escape.json_encode(message)
+        self.data = tornado.escape.utf8(message)
+        self.deflated = {}  # (max_wbits, level) => payload
+
+    def __len__(self):
+        return len(self.data)
+
+    def deflate(self, max_wbits, compression_level):
+        key = (max_wbits, compression_level)
+        if key not in self.deflated:
+            compressor = zlib.compressobj(compression_level, zlib.DEFLATED, -max_wbits)
+            payload = compressor.compress(self.data) + compressor.flush(zlib.Z_SYNC_FLUSH)
+            self.deflated[key] = payload[:-4]  # the 00 00 ff ff tail is implied by the protocol
+        return self.deflated[key]
+
+
+def write_frame(socket, frame, compression_level, min_size):
+    """WebSocketHandler.write_message for a SharedFrame"""
+    connection = socket.ws_connection
+    if connection is None or connection.is_closing():
+        raise tornado.websocket.WebSocketClosedError()
+    if not _supports_shared_frames(connection):
+        return tornado.websocket.WebSocketHandler.write_message(socket, frame.data)
+    # the negotiated compressor is only read for the client's window size
+    compressor = connection._compressor
+    if compressor and len(frame) >= min_size:
+        payload, flags = frame.deflate(compressor._max_wbits, compression_level), connection.RSV1
+    else:
+        payload, flags = frame.data, 0
+    connection._message_bytes_out += len(frame)
+    try:
+        future = connection._write_frame(True, TEXT_OPCODE, payload, flags=flags)
+    except StreamClosedError:
+        raise tornado.websocket.WebSocketClosedError()
+
+    async def wrapper():
+        try:
+            await future
+        except StreamClosedError:
+            raise tornado.websocket.WebSocketClosedError()
+
+    return asyncio.ensure_future(wrapper())
+
+
+def _supports_shared_frames(connection):
+    # the attributes of WebSocketProtocol13 which write_frame relies on
+    if not all([hasattr(connection, name) for name in PROTOCOL_ATTRIBUTES]): return False
+    compressor = connection._compressor
+    return compressor is None or hasattr(compressor, "_max_wbits")
+
+
+TEXT_OPCODE = 0x1
+PROTOCOL_ATTRIBUTES = ["_compressor", "_write_frame", "_message_bytes_out", "RSV1"]
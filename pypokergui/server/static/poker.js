@@ -15,8 +15,21 @@ $(document).ready(function() {
         startGame();
     });
 
-    $("#pause_button").on("click", function() {
-        togglePause();
+    // the button comes with the game page, after the document is ready
+    $(document).on("click", "#pause_button", function() {
+        updater.togglePause();
+    });
+
+    $("#replay_play_button").on("click", function() {
+        sendReplayControl($(this).data("command"));
+    });
+
+    $("#replay_speed").on("change", function() {
+        sendReplayControl("speed", $(this).val());
+    });
+
+    $("#replay_jump_button").on("click", function() {
+        sendReplayControl("jump", $("#replay_jump_hand").val());
     });
   
     updater.start();
@@ -54,6 +67,15 @@ function declareAction(form) {
   updater.socket.send(JSON.stringify(message))
 }
 
+/*
+ * Callback function invoked when
+ * a replay control is used.
+ */
+function sendReplayControl(command, value) {
+  var message = {'type': "replay_control", 'command': command, 'value': value}
+  updater.socket.send(JSON.stringify(message))
+}
+
 /*
  * Helper function to get form information as hash.
  */
@@ -67,20 +89,28 @@ jQuery.fn.formToDict = function() {
     return json;
 };
 
+/*
+ *  Version of the update_game wire protocol this script understands.
+ */
+var PROTOCOL_VERSION = 2;
+
 /*
  *  This object setups and holds websocket.
  */
 var updater = {
     socket: null,
+    roundState: {},
+    asked: false,
+    aiPlayers: [],
 
     /*
      *  This method is invoked when index page is opened.
      *  Setup websocket and register callback method on it.
-     *  URL would be "ws://localhost/pokersocket:8888".
+     *  URL would be "ws://localhost:8888/pokersocket/<table_id>".
      */
     start: function() {
         var scheme = location.protocol === "https:" ? "wss://" : "ws://";
-        var url = scheme + location.host + "/pokersocket";
+        var url = scheme + location.host + "/pokersocket/" + $("body").data("table-id");
         console.log("Connecting to WebSocket at: " + url);
         updater.socket = new WebSocket(url);
         updater.socket.onmessage = function(event) {
@@ -104,8 +134,14 @@ var updater = {
               updater.startGame(message)
             } else if ('update_game' == message['message_type']) {
               updater.updateGame(message)
+            } else if ('update_batch' == message['message_type']) {
+              updater.updateGames(message['messages'])
             } else if ('alert_restart_server' == message['message_type']) {
               updater.alert_restart_server(message)
+            } else if ('alert_start_failure' == message['message_type']) {
+              updater.alert_start_failure(message)
+            } else if ('replay_status' == message['message_type']) {
+              updater.updateReplayStatus(message)
             } else {
               console.error("Unexpected message:", message)
             }
@@ -129,6 +165,7 @@ var updater = {
      * about start of the game.
      */
     startGame: function(message) {
+      updater.aiPlayers = message.ai_players
       var node = $(message.html)
       $("#container").html(node)
       $("#declare_action_form").hide()
@@ -141,61 +178,97 @@ var updater = {
     /*
      * Invoked when received the message about
      * new event of the game like "new round will start".
+     * Shared updates carry only the changed keys of round_state,
+     * which are merged into roundState before the table is drawn.
      */
     updateGame: function(message) {
+        updater.updateGames([message])
+    },
+
+    /*
+     * Invoked with the updates which the server sent in one frame
+     * because no pause separated them. Every delta is merged in order,
+     * then the table and the event of the last update are drawn once.
+     */
+    updateGames: function(messages) {
+        var last = null
+        var changed = false
+        for (var i = 0; i < messages.length; i++) {
+          var message = messages[i]
+          if (message.protocol !== PROTOCOL_VERSION) {
+            window.console.error("unexpected protocol version: " + message.protocol)
+            continue
+          }
+          var content = message['content']
+          if ('snapshot' == content['update_type']) {
+            updater.roundState = {}
+          }
+          if (content.delta && !$.isEmptyObject(content.delta)) {
+            updater.applyDelta(content.delta)
+            changed = true
+          }
+          last = content
+        }
+        if (last === null) return
         $("#declare_action_form").hide()
-        content = message['content']
-        window.console.log("updateGame: " + JSON.stringify(content))
-        message_type = content['update_type']
-        window.console.log("event html : " + JSON.stringify(content.event_html))
-        if ('round_start_message' == message_type) {
-          updater.roundStart(content.event_html)
+        var message_type = last['update_type']
+        updater.asked = ('ask_message' == message_type)
+        if (changed) {
+          $("#table").html(renderRoundState(updater.roundState))
+        }
+        var event = last.event
+        if ('snapshot' == message_type) {
+          // nothing happened yet from the view point of the joined socket
+        } else if ('round_start_message' == message_type) {
+          $("#event_box").html(renderRoundStart(event))
         } else if ('street_start_message' == message_type) {
-          updater.newStreet(content.table_html, content.event_html)
+          $("#event_box").html(renderStreetStart(event))
         } else if ('game_update_message' == message_type) {
-          updater.newAction(content.table_html, content.event_html)
-       } else if ('round_result_message' == message_type) {
-         updater.roundResult(content.table_html, content.event_html)
-       } else if ('game_result_message' == message_type) {
-         updater.gameResult(content.event_html)
-       } else if ('ask_message' == message_type) {
-         $("#declare_action_form").show()
-         updater.askAction(content.table_html, content.event_html)
-       } else {
-          window.console.error("unexpected message in updateGame: " + content)
-       }
-    },
-
-    roundStart: function(event_html) {
-      $("#event_box").html($(event_html))
-    },
-
-    newStreet: function(table_html, event_html) {
-      $("#table").html($(table_html))
-      $("#event_box").html($(event_html))
-    },
-
-    newAction: function(table_html, event_html) {
-      $("#table").html($(table_html))
-      $("#event_box").html($(event_html))
+          $("#event_box").html(renderNewAction(event, updater.roundState))
+        } else if ('round_result_message' == message_type) {
+          $("#event_box").html(renderRoundResult(event, updater.roundState))
+        } else if ('game_result_message' == message_type) {
+          $("#event_box").html(renderGameResult(event))
+        } else if ('ask_message' == message_type) {
+          $("#declare_action_form").show()
+          $("#event_box").html(renderAskAction(event))
+        } else {
+          window.console.error("unexpected message in updateGame: " + JSON.stringify(last))
+        }
     },
 
-    roundResult: function(table_html, event_html) {
-      $("#table").html($(table_html))
-      $("#event_box").html($(event_html))
+    applyDelta: function(delta) {
+      var state = updater.roundState
+      $.each(delta, function(key, value) {
+        if ('seats' == key && !$.isArray(value)) {
+          $.each(value, function(idx, seat) { state.seats[parseInt(idx)] = seat })
+        } else {
+          state[key] = value
+        }
+      })
     },
 
-    gameResult: function(event_html) {
-      $("#event_box").html($(event_html))
+    alert_restart_server: function(message) {
+      alert(message.message)
     },
 
-    askAction: function(table_html, event_html) {
-      $("#table").html($(table_html))
-      $("#event_box").html($(event_html))
+    alert_start_failure: function(message) {
+      alert(message.message)
     },
 
-    alert_restart_server: function(message) {
-      alert(message.message)
+    /*
+     * Invoked when the replay moved to another hand
+     * or was played, paused or sped up.
+     */
+    updateReplayStatus: function(message) {
+      $("#replay_hand").text(message.hand_count ? message.hand : "-")
+      $("#replay_hand_count").text(message.hand_count)
+      $("#replay_jump_hand").attr("max", message.hand_count)
+      $("#replay_play_button")
+        .data("command", message.playing ? "pause" : "play")
+        .text(message.playing ? "Pause" : "Play")
+        .toggleClass("btn-success", !message.playing)
+        .toggleClass("btn-warning", message.playing)
     },
 
     togglePause: function() {
@@ -208,8 +281,172 @@ var updater = {
 };
 
 function isPlayerTurn() {
-    // This is a placeholder - you'll need to implement the actual logic
-    // based on your game state
-    return $("#declare_action_form").is(":visible");
+    // the latest update asked this player for an action
+    return updater.asked;
+}
+
+/*
+ * Client side rendering of the table and the game events.
+ */
+var SUIT_NAMES = {"S": "spade", "H": "heart", "D": "diamond", "C": "club"};
+
+function escapeHtml(text) {
+  return $("<div>").text(String(text)).html();
+}
+
+/*
+ * Card images are looked up from the preloaded images in index.html,
+ * so that they share the versioned urls (and the cache) of static_url.
+ */
+function cardImage(card, style) {
+  var src = $('img[data-card="' + card + '"]').attr("src") ||
+    "/static/images/" + SUIT_NAMES[card[0]] + "/" + card.substring(1) + ".png";
+  return '<img class="card" src="' + src + '"' + (style ? ' style="' + style + '"' : '') + '>';
+}
+
+function potImage() {
+  var src = $('img[data-image="poker_pot"]').attr("src") || "/static/images/poker_pot.png";
+  return '<img src="' + src + '" width=100%>';
+}
+
+function isAIPlayer(uuid) {
+  return updater.aiPlayers.indexOf(uuid) >= 0;
+}
+
+function playerName(round_state, uuid) {
+  var seat = $.grep(round_state.seats || [], function(p) { return p.uuid == uuid })[0];
+  return seat ? seat.name : uuid;
+}
+
+function renderPlayer(round_state, player, idx) {
+  var ai = isAIPlayer(player.uuid);
+  var html = '<div class="col-xs-2 player-' + (player.state == "participating" ? "active" : "folded") + '">';
+  html += '<i class="material-icons md-48 ' + (player.state == "folded" ? "inactive " : "") +
+    (ai ? "color-ai" : "color-human") + '">' + (ai ? "android" : "face") + '</i>';
+  html += '<div>';
+  html += '<span class="round-state-table-text player-name">' + escapeHtml(player.name) + '</span></br>';
+  html += '<span class="round-state-table-text player-stack">$' + player.stack + '</span></br>';
+  if (round_state.dealer_btn == idx) {
+    html += '<span class="label label-warning">Dealer</span>';
+  }
+  return html + '</div></div>';
+}
+
+function renderRoundState(round_state) {
+  var seats = round_state.seats;
+  var half = Math.floor(seats.length / 2);
+  var next = round_state.next_player != "not_found" ? seats[round_state.next_player].name : "None";
+  var html = '<div id="round_state"><div class="text-center">';
+  html += '<h3>Round ' + round_state.round_count + ' : ' + round_state.street.toUpperCase() + ' </h3>';
+  html += '<h3><small>Next Player is [ ' + escapeHtml(next) + ' ]</small></h3></div>';
+
+  html += '<div id="seats-upper" class="row row-center">';
+  for (var i = 0; i < half; i++) { html += renderPlayer(round_state, seats[i], i) }
+  html += '</div>';
+
+  html += '<div id="round-state-table" class="img-rounded"><div id="community_card" class="text-center">';
+  if (round_state.community_card.length > 0) {
+    html += '<h2 class="round-state-table-text">Community Cards</h2>';
+  }
+  $.each(round_state.community_card, function(_, card) {
+    html += cardImage(card, "height: auto; width: 30%");
+  });
+  html += '</div></div>';
+
+  html += '<div class="pot"><div class="text-center"><h4 class="round-state-table-text">Pot</h4></div>';
+  html += '<div class="row row-center"><div class="col-xs-3"><div class="text-center">' + potImage();
+  html += '<h4 class="round-state-table-text">$' + round_state.pot.main.amount + '</h4></div></div>';
+  $.each(round_state.pot.side, function(_, sidepot) {
+    if (sidepot.amount != 0) {
+      html += '<div class="col-xs-2"><div class="text-center">' + potImage();
+      html += '<h4 class="round-state-table-text">$' + sidepot.amount + '</h4></div></div>';
+    }
+  });
+  html += '</div></div>';
+
+  html += '<div id="seats-lower" class="row row-center">';
+  for (var j = half; j < seats.length; j++) { html += renderPlayer(round_state, seats[j], j) }
+  return html + '</div></div>';
+}
+
+function renderEvent(title, content) {
+  return '<div id="event_container"><h3 id="event_title"><span class="label label-success">Event</span> : ' +
+    title + '</h3><div id="event_content">' + content + '</div></div>';
+}
+
+function renderHoleCard(hole_card) {
+  var html = '<h3>Hole Card : ' + escapeHtml(hole_card.join(", ")) + '</h3>';
+  $.each(hole_card, function(_, card) { html += cardImage(card) });
+  return html;
+}
+
+function renderRoundStart(event) {
+  var html = '<div id="round_start">';
+  if (event.hole_cards) {
+    // replays show the hole cards of every player
+    $.each(event.hole_cards, function(_, player) {
+      html += '<h4>' + escapeHtml(player.name) + '</h4>';
+      $.each(player.hole_card, function(_, card) { html += cardImage(card, "height: auto; width: 15%") });
+    });
+  } else {
+    html += renderHoleCard(event.hole_card);
+  }
+  return renderEvent("Round " + event.round_count + " Started", html + '</div>');
 }
 
+function renderStreetStart(event) {
+  return renderEvent("Street Update",
+    '<div id="street_start"><h3> Next => ' + event.street.toUpperCase() + '</h3></div>');
+}
+
+function renderNewAction(event, round_state) {
+  var action = event.action;
+  var amount = action.action != "fold" ? " $" + action.amount : "";
+  return renderEvent("New Action declared",
+    '<div id="update_game"><h4><span>[ ' + escapeHtml(playerName(round_state, action.player_uuid)) +
+    ' ]</span><span> declared </span><span>[ ' + action.action + amount + ' ]</span></h4></div>');
+}
+
+function renderRoundResult(event, round_state) {
+  var names = $.map(event.winners, function(p) { return escapeHtml(p.name) }).join(" ");
+  var html = '<div id="round_result"><h4 class="sub-header">🏆 Winners: <span class="winner-names">' +
+    names + '</span></h4>';
+  html += '<table class="table table-bordered"><thead><tr><th>player</th><th>card1</th>' +
+    '<th>card2</th><th>Strength</th></tr></thead><tbody>';
+  $.each(event.hand_info, function(_, hand) {
+    html += '<tr><td class="hand-player-name">' + escapeHtml(playerName(round_state, hand.uuid)) + '</td>';
+    html += '<td>' + cardImage(hand.hand_cards[0], "height: auto; width: 100%") + '</td>';
+    html += '<td>' + cardImage(hand.hand_cards[1], "height: auto; width: 100%") + '</td>';
+    html += '<td> ' + hand.strength + '</td></tr>';
+  });
+  return renderEvent("Round Result", html + '</tbody></table></div>');
+}
+
+function renderGameResult(event) {
+  var seats = event.seats.slice().sort(function(a, b) { return b.stack - a.stack });
+  var html = '<div id="game_result"><table class="table"><thead><tr>' +
+    '<th class="text-center">type</th><th class="text-center">name</th>' +
+    '<th class="text-center">stack</th></tr></thead><tbody>';
+  $.each(seats, function(_, player) {
+    var ai = isAIPlayer(player.uuid);
+    html += '<tr><td class="text-center"><i class="material-icons md-18 dark ' +
+      (player.state == "folded" ? "inactive " : "") + (ai ? "color-ai" : "color-human") + '">' +
+      (ai ? "android" : "face") + '</i></td>';
+    html += '<td class="text-center">' + escapeHtml(player.name) + '</td>';
+    html += '<td class="text-center">' + player.stack + '</td></tr>';
+  });
+  return renderEvent("Game Result", html + '</tbody></table></div>');
+}
+
+function renderAskAction(event) {
+  var labels = {"call": "📞 Call", "fold": "❌ Fold", "raise": "⬆️ Raise"};
+  var html = '<div id="ask_action">' + renderHoleCard(event.hole_card) + '<ul class="list-group">';
+  $.each(event.valid_actions, function(_, action) {
+    var name = action.action.toLowerCase();
+    var amount = typeof action.amount === "object" ? action.amount.min + " - " + action.amount.max : action.amount;
+    html += '<li class="list-group-item d-flex justify-content-between align-items-center"><span>' +
+      (labels[name] || "❓ " + escapeHtml(action.action)) + '</span>' +
+      '<span class="badge bg-primary rounded-pill">$' + amount + '</span></li>';
+  });
+  return renderEvent("Declare Your Action", html + '</ul></div>');
+}
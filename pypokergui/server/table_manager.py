@@ -0,0 +1,79 @@
+import itertools
+from collections import OrderedDict
+
+import pypokergui.server.game_manager as GM
+import pypokergui.server.delivery_scheduler as DS
+import pypokergui.server.game_loop as GL
+
+
+class PokerTable(object):
+
+    def __init__(self, table_id, config, recorder=None):
+        self.table_id = table_id
+        self.game_manager = GM.setup_game_manager(config, isolate_ai=True)
+        if recorder: self.game_manager.attach_recorder(recorder, "table-%s" % table_id)
+        self.scheduler = DS.DeliveryScheduler()
+        self.sockets = {}  # uuid => socket
+        self.closed = False
+        self.game_loop = None
+
+    def join_socket(self, socket):
+        self.sockets[socket.uuid] = socket
+
+    def leave_socket(self, socket):
+        self.sockets.pop(socket.uuid, None)
+
+    def has_game_finished(self):
+        game_manager = self.game_manager
+        return game_manager.is_playing_poker and GM.has_game_finished(game_manager.latest_messages)
+
+    def status(self):
+        # the game is over for the lobby once its viewers have seen the end
+        if self.has_game_finished() and self.scheduler.is_idle(): return "finished"
+        if self.game_manager.is_playing_poker: return "playing"
+        return "starting" if self.game_loop else "waiting"
+
+    def start_game_loop(self, handler, mode):
+        self.game_loop = GL.TableGameLoop(self, handler, mode)
+        self.game_loop.start()
+
+    def close(self):
+        self.closed = True
+        if self.game_loop: self.game_loop.stop()
+        self.game_manager.shutdown_ai_players()
+        self.scheduler.clear()
+        for socket in list(self.sockets.values()):
+            socket.close()
+        self.sockets.clear()
+
+
+class TableRegistry(object):
+    """Hold every table hosted by the server process.
+
+    Each table owns its GameManager, the sockets which joined it and the
+    scheduler which paces its updates, so games on different tables
+    progress independently of each other.
+    """
+
+    def __init__(self, config, recorder=None):
+        self.config = config
+        self.recorder = recorder
+        self.tables = OrderedDict()
+        self.id_counter = itertools.count(1)
+
+    def create_table(self):
+        table_id = str(next(self.id_counter))
+        table = PokerTable(table_id, self.config, self.recorder)
+        self.tables[table_id] = table
+        return table
+
+    def get_table(self, table_id):
+        return self.tables.get(table_id)
+
+    def list_tables(self):
+        return list(self.tables.values())
+
+    def remove_table(self, table_id):
+        table = self.tables.pop(table_id, None)
+        if table: table.close()
+        return table
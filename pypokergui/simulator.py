@@ -0,0 +1,245 @@
+import math
+import time
+import random
+import functools
+import multiprocessing
+from collections import OrderedDict
+
+import numpy as np
+
+import pypokergui.equity as EQ
+
+import pypokergui.server.game_manager as GM
+import pypokergui.server.hand_recorder as HR
+
+"""Run complete games between AI players without the GUI server.
+    Games are driven through the same GameManager (EngineWrapper and
+    ai_generator loader) as the server, but no templates are rendered,
+    no sockets are involved and no pacing is applied between events.
+    Game i is played with random seed (seed + i), so any game of a batch can
+    be reproduced by running it alone with that seed. The seed is given to
+    random, NumPy's global generator and the default generator of equity, so
+    bots drawing from those get the same numbers too. Bots which stop on a
+    time budget (e.g. estimate_equity) still depend on the machine's speed.
+"""
+def run_simulation(config, num_games, workers=1, seed=None, record_path=None):
+    assert num_games > 0 and workers > 0
+    if seed is None: seed = random.SystemRandom().randint(0, MAX_SEED)
+    seeds = [seed + i for i in range(num_games)]
+    play = functools.partial(play_seeded_game, config, record=record_path is not None)
+    results, elapsed = _run_jobs(play, seeds, workers, record_path)
+    report = gen_simulation_report(results, elapsed)
+    report["seed"] = seed
+    report["workers"] = workers
+    return report
+
+def play_seeded_game(config, seed, record=False):
+    seed_game(seed)
+    result = play_game(config, "seed-%d" % seed if record else None)
+    result["seed"] = seed
+    return result
+
+def seed_game(seed):
+    # every generator which the shipped modules or a bot could draw from
+    random.seed(seed)
+    np.random.seed(seed)
+    EQ.seed(seed)
+
+def play_game(config, record_game_id=None, deck_source=None):
+    # nothing keeps old states around, so actions can be applied in place
+    game_manager = GM.setup_game_manager(config, in_place_engine=True)
+    game_manager.deck_source = deck_source
+    hand_collector = HandCollector()
+    if record_game_id: game_manager.attach_recorder(hand_collector, record_game_id)
+    game_manager.start_game()
+    GM.broadcast_game_start_to_ai(game_manager)
+    hand_count = 0
+    while True:
+        hand_count += _dispatch_messages_to_ai(game_manager)
+        if GM.has_game_finished(game_manager.latest_messages): break
+        action, amount = game_manager.ask_action_to_ai_player(game_manager.next_player_uuid)
+        game_manager.update_game(action, amount)
+    _uuid, game_result = game_manager.latest_messages[-1]
+    seats = game_result['message']['game_information']['seats']
+    return {
+            "hands": hand_count,
+            "stacks": [(seat["uuid"], seat["name"], seat["stack"]) for seat in seats],
+            "hand_histories": hand_collector.hands
+            }
+
+"""Duplicate matches replay the same seeded deals with the seats rotated.
+    Deal set i is dealt from decks seeded with (seed + i) and played once per
+    rotation of the ai_players of the config, so every bot gets the cards
+    of every seat. The luck of the cards cancels out of the mean result of
+    a bot over the rotations of a set, and bots are ranked by it with the
+    confidence that each one is ahead of the next.
+"""
+def run_duplicate_simulation(config, num_deals, workers=1, seed=None, record_path=None):
+    assert num_deals > 0 and workers > 0 and len(config['ai_players']) >= 2
+    if seed is None: seed = random.SystemRandom().randint(0, MAX_SEED)
+    jobs = [(seed + i, rotation) for i in range(num_deals) for rotation in range(len(config['ai_players']))]
+    play = functools.partial(play_duplicate_game, config, record=record_path is not None)
+    results, elapsed = _run_jobs(play, jobs, workers, record_path)
+    report = gen_duplicate_report(config, results, elapsed)
+    report["seed"] = seed
+    report["workers"] = workers
+    return report
+
+def play_duplicate_game(config, job, record=False):
+    seed, rotation = job
+    num_players = len(config['ai_players'])
+    rotated = dict(config, ai_players=rotate_seats(config['ai_players'], rotation))
+    seed_game(seed)
+    result = play_game(rotated, "seed-%d-rotation-%d" % (seed, rotation) if record else None,
+            functools.partial(gen_seeded_deck, seed))
+    result["seed"] = seed
+    result["rotation"] = rotation
+    # ai uuids are their seat positions, and seat p holds entry (p + rotation) of the config
+    result["entries"] = [((int(uuid) + rotation) % num_players, stack) for uuid, _name, stack in result["stacks"]]
+    return result
+
+def rotate_seats(players, rotation):
+    return players[rotation:] + players[:rotation]
+
+def gen_seeded_deck(seed, round_count):
+    # the same cards in the same order for every rotation of a deal set
+    return random.Random("%d:%d" % (seed, round_count)).sample(range(1, 53), 52)
+
+def gen_duplicate_report(config, results, elapsed):
+    num_players = len(config['ai_players'])
+    deal_sets = OrderedDict()  # seed => chips won by each entry over the rotations
+    for result in results:
+        chips = deal_sets.setdefault(result["seed"], [0] * num_players)
+        for entry, stack in result["entries"]:
+            chips[entry] += stack - config['initial_stack']
+    scores = [[chips[entry] / num_players for chips in deal_sets.values()] for entry in range(num_players)]
+    standings = []
+    for entry, player in enumerate(config['ai_players']):
+        mean, stderr = _mean_and_stderr(scores[entry])
+        standings.append({ "entry": entry, "name": player["name"], "average_chips": mean, "stderr": stderr })
+    ranking = sorted(standings, key=lambda s: s["average_chips"], reverse=True)
+    for standing, next_standing in zip(ranking, ranking[1:]):
+        # both played the same deals, so their difference is judged deal set by deal set
+        diffs = [a - b for a, b in zip(scores[standing["entry"]], scores[next_standing["entry"]])]
+        mean, stderr = _mean_and_stderr(diffs)
+        standing["confidence_ahead"] = _normal_cdf(mean / stderr) if stderr > 0 else (1.0 if mean > 0 else 0.5)
+    game_count = len(results)
+    hand_count = sum([result["hands"] for result in results])
+    return {
+            "deals": len(deal_sets),
+            "games": game_count,
+            "hands": hand_count,
+            "elapsed": elapsed,
+            "games_per_sec": game_count / elapsed if elapsed > 0 else float("inf"),
+            "hands_per_sec": hand_count / elapsed if elapsed > 0 else float("inf"),
+            "standings": ranking
+            }
+
+def format_duplicate_report(report):
+    lines = [
+            "seed : %d (%d workers)" % (report["seed"], report["workers"]),
+            "deals : %d (%d games, %.2f games/sec)" % (report["deals"], report["games"], report["games_per_sec"]),
+            "hands : %d (%.2f hands/sec)" % (report["hands"], report["hands_per_sec"]),
+            "elapsed : %.2f sec" % report["elapsed"],
+            "",
+            "%-4s %-20s %12s %10s %10s" % ("rank", "name", "avg chips", "95% ci", "> next")
+            ]
+    for rank, standing in enumerate(report["standings"], 1):
+        confidence = "%9.1f%%" % (standing["confidence_ahead"] * 100) if "confidence_ahead" in standing else ""
+        lines.append("%-4d %-20s %12.2f %10s %10s" % (rank, standing["name"],
+            standing["average_chips"], "+-%.2f" % (CONFIDENCE_Z * standing["stderr"]), confidence))
+    return "\n".join(lines)
+
+def _mean_and_stderr(values):
+    mean = sum(values) / len(values)
+    if len(values) < 2: return mean, 0.0
+    variance = sum([(value - mean) ** 2 for value in values]) / (len(values) - 1)
+    return mean, math.sqrt(variance / len(values))
+
+def _normal_cdf(z):
+    return 0.5 * (1 + math.erf(z / math.sqrt(2)))
+
+def gen_simulation_report(results, elapsed):
+    game_count = len(results)
+    hand_count = sum([result["hands"] for result in results])
+    standings = OrderedDict()
+    for result in results:
+        best_stack = max([stack for _uuid, _name, stack in result["stacks"]])
+        for uuid, name, stack in result["stacks"]:
+            if uuid not in standings:
+                standings[uuid] = { "uuid": uuid, "name": name, "total_stack": 0, "wins": 0 }
+            standings[uuid]["total_stack"] += stack
+            if stack == best_stack: standings[uuid]["wins"] += 1
+    for standing in standings.values():
+        standing["average_stack"] = standing["total_stack"] / game_count
+    ranking = sorted(standings.values(), key=lambda s: s["average_stack"], reverse=True)
+    return {
+            "games": game_count,
+            "hands": hand_count,
+            "elapsed": elapsed,
+            "games_per_sec": game_count / elapsed if elapsed > 0 else float("inf"),
+            "hands_per_sec": hand_count / elapsed if elapsed > 0 else float("inf"),
+            "standings": ranking
+            }
+
+def format_simulation_report(report):
+    lines = [
+            "seed : %d (%d workers)" % (report["seed"], report["workers"]),
+            "games : %d (%.2f games/sec)" % (report["games"], report["games_per_sec"]),
+            "hands : %d (%.2f hands/sec)" % (report["hands"], report["hands_per_sec"]),
+            "elapsed : %.2f sec" % report["elapsed"],
+            "",
+            "%-4s %-20s %12s %8s" % ("rank", "name", "avg stack", "wins")
+            ]
+    for rank, standing in enumerate(report["standings"], 1):
+        lines.append("%-4d %-20s %12.2f %8d" % (
+            rank, standing["name"], standing["average_stack"], standing["wins"]))
+    return "\n".join(lines)
+
+def _run_jobs(play, jobs, workers, record_path):
+    # games are played in the given order, and their results come back in it
+    recorder = HR.HandRecorder(record_path) if record_path else None
+    start_time = time.time()
+    if workers == 1:
+        results = _collect_results(map(play, jobs), recorder)
+    else:
+        # a few chunks per worker keeps the pool balanced without paying IPC per game
+        chunksize = max(1, len(jobs) // (workers * 4))
+        with multiprocessing.Pool(workers) as pool:
+            results = _collect_results(pool.imap(play, jobs, chunksize), recorder)
+    if recorder: recorder.close()
+    return results, time.time() - start_time
+
+def _collect_results(results, recorder):
+    # hand histories are written in game order as the games come in
+    collected = []
+    for result in results:
+        hand_histories = result.pop("hand_histories")
+        if recorder:
+            for hand in hand_histories: recorder.record(hand)
+        collected.append(result)
+    return collected
+
+class HandCollector(object):
+
+    def __init__(self):
+        self.hands = []
+
+    def record(self, hand):
+        self.hands.append(hand)
+
+def _dispatch_messages_to_ai(game_manager):
+    hand_count = 0
+    for destination, update in game_manager.latest_messages:
+        if destination == -1:
+            receivers = list(game_manager.ai_players.values())
+        else:
+            receivers = [game_manager.ai_players[destination]]
+        for ai_player in receivers:
+            GM.broadcast_message_to_ai(ai_player, update)
+        if 'round_result_message' == update['message']['message_type']:
+            hand_count += 1
+    return hand_count
+
+MAX_SEED = 2**31 - 1
+CONFIDENCE_Z = 1.96  # 95% two-sided
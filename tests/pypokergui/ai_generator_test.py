@@ -0,0 +1,74 @@
+import os
+import sys
+import shutil
+import tempfile
+
+from tests.base_unittest import BaseUnitTest
+
+import pypokergui.ai_generator as AG
+
+class AIGeneratorTest(BaseUnitTest):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_same_file_name_in_different_folders(self):
+        first = self._write_script("first", "mybot.py", "first")
+        second = self._write_script("second", "mybot.py", "second")
+        self.eq("first", AG.setup_player(first).marker)
+        self.eq("second", AG.setup_player(second).marker)
+        self.neq(AG.load_setup_method(first).__module__, AG.load_setup_method(second).__module__)
+
+    def test_import_once_per_path(self):
+        path = self._write_script("bots", "mybot.py", "hoge")
+        setup_method = AG.load_setup_method(path)
+        relative_path = os.path.relpath(path)
+        self.true(setup_method is AG.load_setup_method(relative_path))
+        AG.setup_player(path)
+        AG.setup_player(path)
+        self.eq(1, self._import_count(path))
+        self.true(setup_method.__module__ in sys.modules)
+
+    def test_timings(self):
+        path = self._write_script("bots", "mybot.py", "hoge")
+        timings = {}
+        player = AG.setup_player(path, timings)
+        self.eq(["import", "init", "warm_up"], sorted(timings.keys()))
+        self.true(player.warmed_up)
+        self.true(timings["warm_up"] >= 0.05)
+        self.true(timings["import"] >= 0 and timings["init"] >= 0)
+
+    def _write_script(self, folder, name, marker):
+        os.makedirs(os.path.join(self.dir, folder), exist_ok=True)
+        path = os.path.join(self.dir, folder, name)
+        with open(path, "w") as f:
+            f.write(SCRIPT_TEMPLATE % { "marker": marker, "count_path": path + ".count" })
+        return path
+
+    def _import_count(self, path):
+        with open(path + ".count") as f:
+            return len(f.read())
+
+
+SCRIPT_TEMPLATE = """
+import time
+from pypokerengine.players import BasePokerPlayer
+
+with open(%(count_path)r, "a") as f: f.write("x")
+
+class MarkedPlayer(BasePokerPlayer):
+
+    def __init__(self):
+        self.marker = %(marker)r
+        self.warmed_up = False
+
+    def warm_up(self):
+        time.sleep(0.05)
+        self.warmed_up = True
+
+def setup_ai():
+    return MarkedPlayer()
+"""
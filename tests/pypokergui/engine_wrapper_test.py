@@ -0,0 +1,66 @@
+import random
+
+from tests.base_unittest import BaseUnitTest
+
+import pypokergui.engine_wrapper as Engine
+
+class EngineWrapperTest(BaseUnitTest):
+
+    def test_in_place_game_is_same_as_copying_game(self):
+        for seed in range(5):
+            self.eq(play_game(seed, in_place=False), play_game(seed, in_place=True))
+
+    def test_snapshot_is_unaffected_by_later_actions(self):
+        engine = start_engine(in_place=True)
+        snapshot = engine.snapshot()
+        before = serialize_state(snapshot)
+        engine.update_game("raise", 30)
+        engine.update_game("call", 30)
+        self.eq(before, serialize_state(snapshot))
+        self.neq(before, serialize_state(engine.current_state))
+
+    def test_undo_restores_table(self):
+        engine = start_engine(in_place=True)
+        states = [serialize_state(engine.current_state)]
+        # raise, call and call carry the round to the flop
+        for action, amount in [("raise", 30), ("call", 30), ("call", 30)]:
+            engine.update_game(action, amount)
+            states.append(serialize_state(engine.current_state))
+        self.eq(1, engine.current_state["street"])
+        for expected in reversed(states[:-1]):
+            engine.undo()
+            self.eq(expected, serialize_state(engine.current_state))
+        self.size(0, engine.action_log)
+
+
+def start_engine(in_place=False):
+    engine = Engine.EngineWrapper(in_place)
+    players_info = Engine.gen_players_info(["a", "b", "c"], ["A", "B", "C"])
+    engine.start_game(players_info, Engine.gen_game_config(10, 100, 10, 0))
+    return engine
+
+def play_game(seed, in_place=False):
+    random.seed(seed)
+    engine = Engine.EngineWrapper(in_place)
+    players_info = Engine.gen_players_info(["a", "b", "c"], ["A", "B", "C"])
+    messages = engine.start_game(players_info, Engine.gen_game_config(10, 100, 10, 5))
+    history = list(messages)
+    step = 0
+    while messages[-1][1]["message"]["message_type"] != "game_result_message":
+        step += 1
+        messages = engine.update_game(*choose_action(messages[-1][1], step))
+        history += messages
+    return history
+
+def choose_action(ask, step):
+    # a fixed mix of folds, raises and calls
+    valid_actions = ask["message"]["valid_actions"]
+    raise_amount = valid_actions[2]["amount"]
+    if step % 7 == 0:
+        return "fold", 0
+    if step % 5 == 0 and raise_amount["min"] != -1:
+        return "raise", raise_amount["min"]
+    return valid_actions[1]["action"], valid_actions[1]["amount"]
+
+def serialize_state(state):
+    return dict(state, table=state["table"].serialize())
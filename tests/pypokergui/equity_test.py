@@ -0,0 +1,40 @@
+import time
+
+import numpy as np
+
+from tests.base_unittest import BaseUnitTest
+
+import pypokergui.equity as EQ
+
+class EquityTest(BaseUnitTest):
+
+    def test_pocket_aces_against_one_hand(self):
+        result = EQ.estimate_equity(["SA", "HA"], time_budget=0, batch_size=20000, rng=np.random.default_rng(1))
+        self.almosteq(0.85, result["equity"], 0.01)
+        self.true(result["low"] <= result["equity"] <= result["high"])
+
+    def test_split_pot(self):
+        # the board is a royal flush, so every player splits
+        board = ["ST", "SJ", "SQ", "SK", "SA"]
+        result = EQ.estimate_equity(["C2", "D3"], board, opponents=1, time_budget=0, batch_size=100)
+        self.eq(0.5, result["equity"])
+        result = EQ.estimate_equity(["C2", "D3"], board, opponents=2, time_budget=0, batch_size=100)
+        self.almosteq(1 / 3, result["equity"], 1e-9)
+
+    def test_time_budget_after_first_batch(self):
+        result = EQ.estimate_equity(["SA", "HA"], time_budget=0, batch_size=500)
+        self.eq(500, result["samples"])
+        # one batch to measure how long a batch takes
+        start_time = time.perf_counter()
+        EQ.estimate_equity(["SA", "HA"], opponents=3, time_budget=0, batch_size=500)
+        batch_time = time.perf_counter() - start_time
+        start_time = time.perf_counter()
+        result = EQ.estimate_equity(["SA", "HA"], opponents=3, time_budget=0.1, batch_size=500)
+        self.true(time.perf_counter() - start_time < 0.1 + 3 * batch_time)
+        self.true(result["samples"] > 500)
+
+    def test_target_error(self):
+        result = EQ.estimate_equity(["SA", "HA"], time_budget=10, target_error=0.02, batch_size=500)
+        self.true(result["equity"] - result["low"] <= 0.02)
+        self.true(result["high"] - result["equity"] <= 0.02)
+        self.true(result["samples"] < 20000)
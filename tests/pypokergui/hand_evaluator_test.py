@@ -0,0 +1,104 @@
+import random
+import itertools
+from collections import Counter
+
+import numpy as np
+
+from tests.base_unittest import BaseUnitTest
+
+from pypokerengine.engine.card import Card
+from pypokerengine.engine.table import Table
+from pypokerengine.engine.player import Player
+
+import pypokergui.hand_evaluator as HE
+from pypokergui.engine_wrapper import FastGameEvaluator
+
+class HandEvaluatorTest(BaseUnitTest):
+
+    def test_wheel_straight(self):
+        value = evaluate("SA", "H2", "D3", "C4", "S5", "HK", "DQ")
+        self.eq("STRAIGHT", HE.hand_strength(value))
+        self.eq([5], HE.hand_ranks(value))
+        self.true(value < evaluate("S2", "H3", "D4", "C5", "S6", "HK", "DQ"))
+
+    def test_broadway_straight(self):
+        value = evaluate("ST", "HJ", "DQ", "CK", "SA", "H2", "D2")
+        self.eq("STRAIGHT", HE.hand_strength(value))
+        self.eq([14], HE.hand_ranks(value))
+
+    def test_flush_beats_straight(self):
+        value = evaluate("H3", "H4", "H5", "H6", "C7", "H9", "D9")
+        self.eq("FLASH", HE.hand_strength(value))
+        self.eq([9, 6, 5, 4, 3], HE.hand_ranks(value))
+        self.true(value > evaluate("H3", "H4", "H5", "S6", "C7", "H9", "D9"))
+
+    def test_two_trips_make_full_house(self):
+        value = evaluate("SA", "HA", "DA", "SK", "HK", "DK", "C2")
+        self.eq("FULLHOUSE", HE.hand_strength(value))
+        self.eq([14, 13], HE.hand_ranks(value))
+
+    def test_third_pair_is_kicker(self):
+        value = evaluate("SA", "HA", "SK", "HK", "SQ", "HQ", "C2")
+        self.eq("TWOPAIR", HE.hand_strength(value))
+        self.eq([14, 13, 12], HE.hand_ranks(value))
+        self.true(value > evaluate("SA", "HA", "SK", "HK", "SJ", "HJ", "CT"))
+
+    def test_evaluate_matches_reference(self):
+        rng = random.Random(1)
+        for _ in range(3000):
+            cards = rng.sample(range(52), rng.choice([5, 6, 7]))
+            value = HE.evaluate(cards)
+            category, ranks = reference_value(cards)
+            self.eq(HE.HAND_STRENGTH_NAMES[category], HE.hand_strength(value))
+            self.eq([rank + 2 for rank in ranks], HE.hand_ranks(value))
+
+    def test_evaluate_batch(self):
+        rng = np.random.default_rng(2)
+        hands = np.argsort(rng.random((2000, 52)), axis=1)[:, :7]
+        expected = [HE.evaluate(hand.tolist()) for hand in hands]
+        self.eq(expected, HE.evaluate_batch(hands).tolist())
+
+    def test_fast_game_evaluator_side_pot(self):
+        table = Table()
+        # a is all-in for 50 with the best hand, b beats c on the kicker
+        for uuid, hole_card, paid in [("a", ["SA", "HA"], 50), ("b", ["SK", "CQ"], 100), ("c", ["HK", "C4"], 100)]:
+            player = Player(uuid, 100 - paid)
+            player.add_holecard([Card.from_str(card) for card in hole_card])
+            player.pay_info.update_by_pay(paid)
+            if paid == 50: player.pay_info.update_to_allin()
+            table.seats.sitdown(player)
+        for card in ["DK", "D7", "C9", "SJ", "H3"]:
+            table.add_community_card(Card.from_str(card))
+        winners, hand_info, prize_map = FastGameEvaluator.judge(table)
+        self.eq(["a"], [player.uuid for player in winners])
+        self.eq({0: 150, 1: 100, 2: 0}, prize_map)
+        self.eq(["a", "b", "c"], [info["uuid"] for info in hand_info])
+        self.eq({ "strength": "ONEPAIR", "high": 13, "low": 0 }, hand_info[1]["hand"]["hand"])
+
+
+def evaluate(*card_strs):
+    return HE.evaluate(HE.parse_cards(card_strs))
+
+def reference_value(cards):
+    # the best 5 card hand by brute force, as (category, ranks deciding ties)
+    return max([_reference_five(five) for five in itertools.combinations(cards, 5)])
+
+def _reference_five(cards):
+    ranks = sorted([card >> 2 for card in cards], reverse=True)
+    is_flush = len(set([card & 3 for card in cards])) == 1
+    counts = Counter(ranks)
+    grouped = sorted(counts, key=lambda rank: (counts[rank], rank), reverse=True)
+    shape = sorted(counts.values(), reverse=True)
+    straight_high = None
+    if len(counts) == 5:
+        if ranks[0] - ranks[4] == 4: straight_high = ranks[0]
+        if ranks == [12, 3, 2, 1, 0]: straight_high = 3
+    if straight_high is not None and is_flush: return (HE.STRAIGHTFLASH, [straight_high])
+    if shape == [4, 1]: return (HE.FOURCARD, grouped)
+    if shape == [3, 2]: return (HE.FULLHOUSE, grouped)
+    if is_flush: return (HE.FLASH, ranks)
+    if straight_high is not None: return (HE.STRAIGHT, [straight_high])
+    if shape == [3, 1, 1]: return (HE.THREECARD, grouped)
+    if shape == [2, 2, 1]: return (HE.TWOPAIR, grouped)
+    if shape == [2, 1, 1, 1]: return (HE.ONEPAIR, grouped)
+    return (HE.HIGHCARD, ranks)
@@ -0,0 +1,75 @@
+import os
+import struct
+import shutil
+import tempfile
+
+import numpy as np
+
+from tests.base_unittest import BaseUnitTest
+
+import pypokergui.equity as EQ
+import pypokergui.preflop as PF
+import pypokergui.hand_evaluator as HE
+
+class PreflopTest(BaseUnitTest):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.dir = tempfile.mkdtemp()
+        cls.table_path = os.path.join(cls.dir, "preflop_table.bin")
+        cls.table = PF.build_preflop_table(cls.table_path, runouts=200, seed=1)
+
+    @classmethod
+    def tearDownClass(cls):
+        PF._tables.clear()
+        shutil.rmtree(cls.dir)
+
+    def test_hand_class_index(self):
+        self.eq((12, 12), PF.hand_class_index(["SA", "HA"]))
+        self.eq((12, 11), PF.hand_class_index(["SK", "SA"]))
+        self.eq((11, 12), PF.hand_class_index(["SA", "HK"]))
+        self.eq("AA", PF.hand_class_name(12, 12))
+        self.eq("AKs", PF.hand_class_name(12, 11))
+        self.eq("AKo", PF.hand_class_name(11, 12))
+
+    def test_class_hole_is_in_its_class(self):
+        for row in range(13):
+            for col in range(13):
+                hole = PF._gen_class_hole(row, col).tolist()
+                self.eq((row, col), PF.hand_class_index([HE.card_to_str(card) for card in hole]))
+                self.eq(row > col, (hole[0] & 3) == (hole[1] & 3))
+
+    def test_load_header_and_memmap(self):
+        path = os.path.join(self.dir, "small_table.bin")
+        body = np.arange(13 * 13 * 2, dtype="<f4").reshape((13, 13, 2)) / 1000
+        with open(path, "wb") as f:
+            f.write(struct.pack(PF.HEADER_FORMAT, PF.MAGIC, 13, 2, 100).ljust(PF.HEADER_SIZE, b"\0"))
+            f.write(body.tobytes())
+        table = PF.load_preflop_table(path)
+        self.true(isinstance(table, np.memmap))
+        self.eq((13, 13, 2), table.shape)
+        self.true(table is PF.load_preflop_table(path))
+        self.almosteq(float(body[12, 11, 1]), PF.preflop_equity(["SA", "SK"], 2, path), 1e-9)
+        self.almosteq(float(body[11, 12, 0]), PF.preflop_equity(["SA", "HK"], 1, path), 1e-9)
+
+    def test_bad_magic(self):
+        path = os.path.join(self.dir, "not_a_table.bin")
+        with open(path, "wb") as f:
+            f.write(struct.pack(PF.HEADER_FORMAT, b"NOTATABL", 13, 1, 1).ljust(PF.HEADER_SIZE, b"\0"))
+            f.write(np.zeros(13 * 13, dtype="<f4").tobytes())
+        with self.assertRaises(IOError):
+            PF.load_preflop_table(path)
+        with self.assertRaises(IOError):
+            PF.load_preflop_table(os.path.join(self.dir, "missing.bin"))
+
+    def test_build_preflop_table(self):
+        self.eq((13, 13, PF.MAX_OPPONENTS), PF.load_preflop_table(self.table_path).shape)
+        rng = np.random.default_rng(2)
+        for hole_card in [["SA", "HA"], ["SA", "SK"], ["C7", "D2"], ["H9", "H8"]]:
+            for opponents in [1, 3]:
+                expected = EQ.estimate_equity(hole_card, opponents=opponents,
+                        time_budget=0, batch_size=5000, rng=rng)["equity"]
+                # 200 runouts per entry leave a standard error of about 0.035
+                self.almosteq(expected, PF.preflop_equity(hole_card, opponents, self.table_path), 0.12)
+        # more opponents never make a hand stronger
+        self.true(self.table[12, 12, 0] > self.table[12, 12, PF.MAX_OPPONENTS - 1])
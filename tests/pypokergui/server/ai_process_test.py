@@ -0,0 +1,68 @@
+import os
+import time
+import asyncio
+
+from tests.base_unittest import BaseUnitTest
+
+import pypokergui.server.ai_process as AP
+
+class AIProcessTest(BaseUnitTest):
+
+    def test_build_ai_processes_keeps_loop_running(self):
+        members_info = [{ "type": "ai", "uuid": "0", "name": "slow", "setup_script_path": slow_script_path }]
+        async def run():
+            ticks = []
+            async def tick():
+                while True:
+                    ticks.append(time.time())
+                    await asyncio.sleep(0.05)
+            ticker = asyncio.ensure_future(tick())
+            holder = await AP.build_ai_processes(members_info, startup_timeout=30)
+            ticker.cancel()
+            for ai_process in holder.values(): ai_process.shutdown()
+            return ticks
+        ticks = asyncio.run(run())
+        self.true(len(ticks) > 10)
+        self.true(max([b - a for a, b in zip(ticks, ticks[1:])]) < 0.5)
+
+    def test_build_ai_processes_startup_timeout(self):
+        members_info = [{ "type": "ai", "uuid": "0", "name": "slow", "setup_script_path": slow_script_path }]
+        start_time = time.time()
+        with self.assertRaisesRegex(Exception, "not ready within"):
+            asyncio.run(AP.build_ai_processes(members_info, startup_timeout=0.2))
+        self.true(time.time() - start_time < 1)
+
+    def test_ask_action_deadline_holds_no_thread(self):
+        members_info = [{ "type": "ai", "uuid": str(idx), "name": "hung", "setup_script_path": hung_script_path }
+                for idx in range(3)]
+        async def run():
+            holder = await AP.build_ai_processes(members_info, startup_timeout=30)
+            loop = asyncio.get_running_loop()
+            executor_calls = []
+            loop.run_in_executor = lambda *args: executor_calls.append(args)
+            answers = await asyncio.gather(*[ai_process.ask_action(
+                VALID_ACTIONS, ["SA", "HA"], {}, timeout=0.3) for ai_process in holder.values()])
+            for ai_process in holder.values(): ai_process.shutdown()
+            return answers, executor_calls
+        answers, executor_calls = asyncio.run(run())
+        self.eq([None, None, None], answers)
+        self.eq([], executor_calls)
+
+    def test_ask_action(self):
+        members_info = [{ "type": "ai", "uuid": "0", "name": "fish", "setup_script_path": fish_script_path }]
+        async def run():
+            holder = await AP.build_ai_processes(members_info, startup_timeout=30)
+            answer = await holder["0"].ask_action(VALID_ACTIONS, ["SA", "HA"], {}, timeout=5)
+            holder["0"].shutdown()
+            return answer
+        self.eq(("call", 10), asyncio.run(run()))
+
+VALID_ACTIONS = [
+        { "action": "fold", "amount": 0 },
+        { "action": "call", "amount": 10 },
+        { "action": "raise", "amount": { "min": 20, "max": 100 } }
+        ]
+
+fish_script_path = os.path.join(os.path.dirname(__file__), "sample_ai_setup_script.py")
+hung_script_path = os.path.join(os.path.dirname(__file__), "hung_ai_script.py")
+slow_script_path = os.path.join(os.path.dirname(__file__), "slow_setup_ai_script.py")
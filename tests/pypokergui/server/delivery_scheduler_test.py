@@ -0,0 +1,50 @@
+import asyncio
+
+from tests.base_unittest import BaseUnitTest
+
+import pypokergui.server.delivery_scheduler as DS
+
+class DeliverySchedulerTest(BaseUnitTest):
+
+    def setUp(self):
+        self.scheduler = DS.DeliveryScheduler()
+        self.delivered = []
+
+    def test_deliver_without_wait(self):
+        self.scheduler.schedule(lambda: self.delivered.append("a"), 0)
+        self.scheduler.schedule(lambda: self.delivered.append("b"), 0)
+        self.eq(["a", "b"], self.delivered)
+        self.true(self.scheduler.is_idle())
+
+    def test_hold_deliveries_while_paused(self):
+        self.scheduler.pause()
+        self.scheduler.schedule(lambda: self.delivered.append("a"), 0)
+        self.eq([], self.delivered)
+        self.false(self.scheduler.is_idle())
+        self.scheduler.resume()
+        self.eq(["a"], self.delivered)
+        self.true(self.scheduler.is_idle())
+
+    def test_pause_during_wait(self):
+        async def run():
+            self.scheduler.schedule(lambda: self.delivered.append("a"), 0.05)
+            self.scheduler.schedule(lambda: self.delivered.append("b"), 0)
+            self.scheduler.pause()
+            await asyncio.sleep(0.1)
+            self.eq(["a"], self.delivered)
+            self.false(self.scheduler.is_idle())
+            self.scheduler.resume()
+        asyncio.run(run())
+        self.eq(["a", "b"], self.delivered)
+        self.true(self.scheduler.is_idle())
+
+    def test_resume_before_wait_ends(self):
+        async def run():
+            self.scheduler.schedule(lambda: self.delivered.append("a"), 0.05)
+            self.scheduler.schedule(lambda: self.delivered.append("b"), 0)
+            self.scheduler.pause()
+            self.scheduler.resume()
+            self.eq(["a"], self.delivered)
+            await asyncio.sleep(0.1)
+        asyncio.run(run())
+        self.eq(["a", "b"], self.delivered)
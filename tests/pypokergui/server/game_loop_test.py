@@ -0,0 +1,80 @@
+import asyncio
+from mock import Mock
+
+from tests.base_unittest import BaseUnitTest
+from tests.pypokergui.server.game_manager_test import gen_ask
+
+from pypokergui.server.game_manager import GameManager
+import pypokergui.server.delivery_scheduler as DS
+import pypokergui.server.game_loop as GL
+
+class TableGameLoopTest(BaseUnitTest):
+
+    def test_answer_within_time(self):
+        async def run():
+            game_loop, ask = start_ask(setup_table(0.5, 1, 10))
+            await asyncio.sleep(0.05)
+            self.true(game_loop.declare_action("bar", "call", 10))
+            return await ask, game_loop.table.game_manager
+        action, game_manager = asyncio.run(run())
+        self.eq(("call", 10), action)
+        self.eq(1, game_manager.time_banks["bar"])
+
+    def test_time_out_drains_bank(self):
+        async def run():
+            game_loop, ask = start_ask(setup_table(0.05, 0.05, 10))
+            return await ask, game_loop.table.game_manager
+        action, game_manager = asyncio.run(run())
+        self.eq(("fold", 0), action)
+        self.eq(0, game_manager.time_banks["bar"])
+
+    def test_time_out_checks_when_free(self):
+        async def run():
+            game_loop, ask = start_ask(setup_table(0.05, 0, 0))
+            return await ask
+        self.eq(("call", 0), asyncio.run(run()))
+
+    def test_clock_stops_while_paused(self):
+        async def run():
+            game_loop, ask = start_ask(setup_table(0.1, 1, 10))
+            await asyncio.sleep(0.05)
+            game_loop.toggle_pause()
+            await asyncio.sleep(0.3)
+            self.false(ask.done())
+            game_loop.toggle_pause()
+            await asyncio.sleep(0.02)
+            self.true(game_loop.declare_action("bar", "call", 10))
+            return await ask, game_loop.table.game_manager
+        action, game_manager = asyncio.run(run())
+        self.eq(("call", 10), action)
+        # the pause is not charged, so the answer came within the free time
+        self.eq(1, game_manager.time_banks["bar"])
+
+    def test_ask_waits_for_paused_deliveries(self):
+        async def run():
+            table = setup_table(0.05, 0, 10)
+            game_loop = GL.TableGameLoop(table, None, "dev")
+            game_loop.toggle_pause()
+            ask = asyncio.ensure_future(game_loop._ask_human("bar"))
+            await asyncio.sleep(0.2)
+            self.false(ask.done())
+            game_loop.toggle_pause()
+            return await ask
+        self.eq(("fold", 0), asyncio.run(run()))
+
+
+def setup_table(base_time, bank, call_amount):
+    game_manager = GameManager()
+    game_manager.define_time_bank(base_time, bank)
+    game_manager.time_banks = { "bar": bank }
+    game_manager.latest_messages = [gen_ask("bar", call_amount)]
+    game_manager.next_player_uuid = "bar"
+    table = Mock()
+    table.game_manager = game_manager
+    table.scheduler = DS.DeliveryScheduler()
+    table.sockets = {}
+    return table
+
+def start_ask(table):
+    game_loop = GL.TableGameLoop(table, None, "dev")
+    return game_loop, asyncio.ensure_future(game_loop._ask_human("bar"))
@@ -1,9 +1,11 @@
 import os
+from mock import patch
 
 from tests.base_unittest import BaseUnitTest
 from tests.pypokergui.server.sample_ai_setup_script import FishPlayer
 
 from pypokergui.server.game_manager import GameManager
+import pypokergui.ai_generator as AG
 
 class GameManagerTest(BaseUnitTest):
 
@@ -39,6 +41,25 @@ class GameManagerTest(BaseUnitTest):
         self.GM.remove_human_player_info("bar")
         self.assertIsNone(self.GM.get_human_player_info("bar"))
 
+    def test_members_index(self):
+        self.GM.join_ai_player("hoge", "fuga")
+        self.GM.join_human_player("boo", "bar")
+        self.eq({ "0": self.GM.members_info[0], "bar": self.GM.members_info[1] }, self.GM.members_index)
+        self.GM.join_human_player("boo", "bar")
+        self.size(2, self.GM.members_info)
+        self.GM.remove_human_player_info("bar")
+        self.eq({ "0": self.GM.members_info[0] }, self.GM.members_index)
+
+    def test_is_ai_player_with_many_seats(self):
+        for idx in range(120):
+            self.GM.join_ai_player("ai%d" % idx, "fuga")
+        self.GM.join_human_player("boo", "bar")
+        self.true(all([self.GM.is_ai_player(str(idx)) for idx in range(120)]))
+        self.false(self.GM.is_ai_player("bar"))
+        self.false(self.GM.is_ai_player("120"))
+        self.none(self.GM.get_human_player_info("100"))
+        self.not_none(self.GM.get_human_player_info("bar"))
+
     def test_start_game_build_ai_players(self):
         self.GM.define_rule(10, 100, 10, 5, None)
         self.GM.join_ai_player("hoge", ai_setup_script_path)
@@ -46,6 +67,22 @@ class GameManagerTest(BaseUnitTest):
         self.GM.start_game()
         self.eq(self.GM.ai_players['0'].__class__.__name__, FishPlayer.__name__)
 
+    def test_health_checked_player_is_seated(self):
+        built = []
+        original_setup_player = AG.setup_player
+        def setup_player(script_path, timings=None):
+            built.append(original_setup_player(script_path, timings))
+            return built[-1]
+        self.GM.define_rule(10, 100, 10, 5, None)
+        self.GM.join_ai_player("hoge", ai_setup_script_path)
+        self.GM.join_ai_player("fuga", ai_setup_script_path)
+        with patch('pypokergui.ai_generator.setup_player', side_effect=setup_player):
+            self.GM.start_game()
+        # one player is built per seat, and it is the one which takes the seat
+        self.size(2, built)
+        self.true(self.GM.ai_players['0'] is built[0])
+        self.true(self.GM.ai_players['1'] is built[1])
+
     def test_start_game(self):
         self.GM.define_rule(10, 100, 10, 5, None)
         self.GM.join_ai_player("hoge", ai_setup_script_path)
@@ -77,4 +114,34 @@ class GameManagerTest(BaseUnitTest):
         self.eq("call", action)
         self.eq(20, amount)
 
+    def test_charge_decision_time_drains_bank(self):
+        self.GM.define_time_bank(5, 20)
+        self.GM.time_banks = { "bar": 20 }
+        self.GM.charge_decision_time("bar", 3)
+        self.eq(20, self.GM.time_banks["bar"])
+        self.GM.charge_decision_time("bar", 12)
+        self.eq(13, self.GM.time_banks["bar"])
+        self.eq(18, self.GM.decision_time_limit("bar"))
+        self.GM.charge_decision_time("bar", 30)
+        self.eq(0, self.GM.time_banks["bar"])
+        self.eq(5, self.GM.decision_time_limit("bar"))
+
+    def test_gen_expired_action_checks_when_free(self):
+        self.GM.define_time_bank(5, 20, "fold")
+        self.GM.latest_messages = [gen_ask("bar", 10)]
+        self.eq(("fold", 0), self.GM.gen_expired_action())
+        self.GM.latest_messages = [gen_ask("bar", 0)]
+        self.eq(("call", 0), self.GM.gen_expired_action())
+        self.GM.define_time_bank(5, 20, "call")
+        self.GM.latest_messages = [gen_ask("bar", 10)]
+        self.eq(("call", 10), self.GM.gen_expired_action())
+
+def gen_ask(uuid, call_amount):
+    valid_actions = [
+            { "action": "fold", "amount": 0 },
+            { "action": "call", "amount": call_amount },
+            { "action": "raise", "amount": { "min": 20, "max": 100 } }
+            ]
+    return uuid, { "type": "ask", "message": { "valid_actions": valid_actions } }
+
 ai_setup_script_path = os.path.join(os.path.dirname(__file__), "sample_ai_setup_script.py")
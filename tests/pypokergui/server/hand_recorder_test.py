@@ -0,0 +1,103 @@
+import os
+import json
+import random
+import shutil
+import tempfile
+
+from tests.base_unittest import BaseUnitTest
+from tests.pypokergui.engine_wrapper_test import choose_action
+
+import pypokergui.engine_wrapper as Engine
+import pypokergui.server.hand_recorder as HR
+
+class HandHistoryBuilderTest(BaseUnitTest):
+
+    def setUp(self):
+        random.seed(3)
+        self.messages = play_game()
+        self.hands = HR.HandHistoryBuilder("game").feed(self.messages)
+
+    def test_one_record_per_hand(self):
+        results = [message for _, message in self.messages
+                if message['message']['message_type'] == 'round_result_message']
+        self.eq(len(results), len(self.hands))
+        self.eq(list(range(1, len(results) + 1)), [hand['round_count'] for hand in self.hands])
+        self.eq(["game"], list(set([hand['game'] for hand in self.hands])))
+
+    def test_stacks_before_forced_bets(self):
+        # the first hand starts from the initial stack, the others from the end of the previous one
+        self.eq([100, 100, 100], [seat['stack'] for seat in self.hands[0]['seats']])
+        for previous, hand in zip(self.hands, self.hands[1:]):
+            self.eq(previous['stacks'], { seat['uuid']: seat['stack'] for seat in hand['seats'] })
+        self.eq(5, self.hands[0]['ante'])
+        self.eq(10, self.hands[0]['small_blind_amount'])
+
+    def test_hole_cards_and_actions(self):
+        for hand in self.hands:
+            self.eq(["a", "b", "c"], sorted(hand['hole_cards'].keys()))
+            self.true(all([len(cards) == 2 for cards in hand['hole_cards'].values()]))
+        result = [message for _, message in self.messages
+                if message['message']['message_type'] == 'round_result_message'][0]
+        histories = result['message']['round_state']['action_histories']
+        expected = [(street, history['uuid'], history['action'], history.get('amount', 0))
+                for street in ["preflop", "flop", "turn", "river"] for history in histories.get(street, [])
+                if history['action'] not in HR.FORCED_BET_ACTIONS]
+        actions = [(action['street'], action['uuid'], action['action'].upper(), action['amount'])
+                for action in self.hands[0]['actions']]
+        self.eq([(street, uuid, action) for street, uuid, action, _ in expected],
+                [(street, uuid, action) for street, uuid, action, _ in actions])
+
+
+class HandRecorderTest(BaseUnitTest):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, "hands.jsonl")
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_flush_on_close(self):
+        recorder = HR.HandRecorder(self.path)
+        for idx in range(10): recorder.record({ "round_count": idx })
+        recorder.close()
+        self.eq(list(range(10)), [json.loads(line)["round_count"] for line in read_lines(self.path)])
+
+    def test_rotate(self):
+        recorder = HR.HandRecorder(self.path, max_bytes=40, backup_count=2)
+        for idx in range(8): recorder.record({ "round_count": idx, "padding": "x" * 10 })
+        recorder.close()
+        self.eq(["hands.jsonl", "hands.jsonl.1", "hands.jsonl.2"], sorted(os.listdir(self.dir)))
+        # every record is 40 bytes or more, so the log is rotated after each one
+        # and only the last two are kept
+        for path, round_count in [(self.path + ".2", 6), (self.path + ".1", 7)]:
+            self.eq([round_count], [json.loads(line)["round_count"] for line in read_lines(path)])
+        self.eq([], read_lines(self.path))
+
+    def test_stop_recording_when_log_cannot_be_opened(self):
+        path = os.path.join(self.dir, "missing", "hands.jsonl")
+        with self.assertLogs(level="ERROR") as logs:
+            recorder = HR.HandRecorder(path)
+            recorder.writer.join()
+        self.true("Failed to open" in logs.output[0])
+        self.true(recorder.failed)
+        recorder.record({ "round_count": 1 })
+        self.true(recorder.queue.empty())
+        recorder.close()
+
+
+def play_game():
+    engine = Engine.EngineWrapper()
+    players_info = Engine.gen_players_info(["a", "b", "c"], ["A", "B", "C"])
+    messages = engine.start_game(players_info, Engine.gen_game_config(5, 100, 10, 5))
+    history = list(messages)
+    step = 0
+    while messages[-1][1]["message"]["message_type"] != "game_result_message":
+        step += 1
+        messages = engine.update_game(*choose_action(messages[-1][1], step))
+        history += messages
+    return history
+
+def read_lines(path):
+    with open(path, encoding="utf-8") as f:
+        return f.read().splitlines()
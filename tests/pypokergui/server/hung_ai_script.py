@@ -0,0 +1,13 @@
+import time
+
+from tests.pypokergui.server.sample_ai_setup_script import FishPlayer
+
+
+class HungPlayer(FishPlayer):
+
+    def declare_action(self, valid_actions, hole_card, round_state):
+        while True: time.sleep(1)
+
+
+def setup_ai():
+    return HungPlayer()
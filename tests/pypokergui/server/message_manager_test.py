@@ -1,4 +1,5 @@
 import os
+import json
 from mock import Mock
 from mock import patch
 
@@ -6,31 +7,33 @@ from tests.base_unittest import BaseUnitTest
 
 from pypokergui.server.game_manager import GameManager
 import pypokergui.server.message_manager as MM
+import pypokergui.server.delivery_scheduler as DS
+import pypokergui.server.shared_frame as SF
 
 class MessageManagerTest(BaseUnitTest):
 
     def test_broadcast_config_update(self):
         uuids = ["hoge", "fuga"]
-        sockets = [gen_mock_socket(uuid) for uuid in uuids]
+        sockets = {uuid: gen_mock_socket(uuid) for uuid in uuids}
         with patch(
                 'pypokergui.server.message_manager._gen_config_update_message',
                 side_effect=lambda x, y, uuid: "config_update:%s" % uuid):
             MM.broadcast_config_update("handler", GameManager(), sockets)
-        for soc, uuid in zip(sockets, uuids):
+        for uuid, soc in sockets.items():
             expected = "config_update:%s" % uuid
-            self.eq(expected, soc.write_message.call_args_list[0][0][0])
+            self.eq(expected, received_messages(soc)[0])
 
     def test_broadcast_start_game(self):
         uuids = ["hoge", "fuga"]
-        sockets = [gen_mock_socket(uuid) for uuid in uuids]
+        sockets = {uuid: gen_mock_socket(uuid) for uuid in uuids}
         gm = setup_game_manager(uuids)
         with patch(
                 'pypokergui.server.message_manager._gen_start_game_message',
                 side_effect=lambda x, y, uuid: "start_game:%s" % uuid):
             MM.broadcast_start_game("handler", gm, sockets)
-        for soc, uuid in zip(sockets, uuids):
+        for uuid, soc in sockets.items():
             expected = "start_game:%s" % uuid
-            self.eq(expected, soc.write_message.call_args_list[0][0][0])
+            self.eq(expected, received_messages(soc)[0])
         for uuid, player in gm.ai_players.items():
             self.eq(uuid, player.uuid)
             self.eq(3, player.game_info["player_num"])
@@ -41,7 +44,7 @@ class MessageManagerTest(BaseUnitTest):
 
     def test_broadcast_update_game(self):
         uuids = ["hoge", "fuga"]
-        sockets = [gen_mock_socket(uuid) for uuid in uuids]
+        sockets = {uuid: gen_mock_socket(uuid) for uuid in uuids}
         gm = setup_game_manager(uuids)
         list(gm.ai_players.values())[0].debug_message = None
         gm.update_game("fold", 0)
@@ -49,15 +52,114 @@ class MessageManagerTest(BaseUnitTest):
                 'pypokergui.server.message_manager._gen_game_update_message',
                 return_value="update_game"),\
             patch(
-                'pypokergui.server.message_manager._broadcast_message_to_ai',
+                'pypokergui.server.game_manager.broadcast_message_to_ai',
                 side_effect=self._append_log_on_player):
-            MM.broadcast_update_game("handler", gm, sockets, mode="dev")
-        for soc, uuid in zip(sockets, uuids):
+            MM.broadcast_update_game(gm, sockets, DS.DeliveryScheduler(), mode="dev")
+        for soc in sockets.values():
             expected = "update_game"
-            self.eq(expected, soc.write_message.call_args_list[0][0][0])
+            self.eq(expected, received_messages(soc)[0])
         for player in gm.ai_players.values():
             self.assertIsNotNone(player.debug_message)
 
+    def test_broadcast_update_game_paces_through_scheduler(self):
+        uuids = ["hoge", "fuga"]
+        sockets = {uuid: gen_mock_socket(uuid) for uuid in uuids}
+        gm = setup_game_manager(uuids)
+        gm.update_game("fold", 0)
+        ioloop = Mock()
+        with patch('tornado.ioloop.IOLoop.current', return_value=ioloop),\
+            patch('time.sleep') as sleep:
+            MM.broadcast_update_game(gm, sockets, DS.DeliveryScheduler(), mode="moderate")
+        self.false(sleep.called)
+        # the fold is delivered at once, and the ask waits for its interval
+        wait_interval = MM.MODERATE_WAIT_INTERVAL["game_update_message"]
+        self.eq(wait_interval, ioloop.call_later.call_args[0][0])
+        self.eq(["update_game"], [message["message_type"] for message in received_messages(sockets["fuga"])])
+        ioloop.call_later.call_args[0][1]()
+        self.eq("ask_message", received_messages(sockets["fuga"])[-1]["content"]["update_type"])
+
+    def test_dev_mode_sends_one_batch_per_socket(self):
+        sockets = {uuid: gen_mock_socket(uuid) for uuid in ["hoge", "fuga", "spectator"]}
+        gm = setup_game_manager(["hoge", "fuga"])
+        MM.broadcast_update_game(gm, sockets, DS.DeliveryScheduler(), mode="dev")
+        for soc in sockets.values():
+            self.eq(1, soc.send_frame.call_count)
+        for uuid in ["hoge", "fuga"]:
+            self.eq("update_batch", json.loads(sent_frames(sockets[uuid])[0].data)["message_type"])
+        self.eq(["round_start_message", "street_start_message", "ask_message"],
+                [message["content"]["update_type"] for message in received_messages(sockets["hoge"])])
+        self.eq(["round_start_message", "street_start_message"],
+                [message["content"]["update_type"] for message in received_messages(sockets["fuga"])])
+        # a single update goes out as it is
+        self.eq("update_game", json.loads(sent_frames(sockets["spectator"])[0].data)["message_type"])
+
+    def test_nonzero_wait_splits_batch(self):
+        sockets = {uuid: gen_mock_socket(uuid) for uuid in ["hoge", "fuga"]}
+        gm = setup_game_manager(["hoge", "fuga"])
+        gm.update_game("fold", 0)
+        ioloop = Mock()
+        with patch('tornado.ioloop.IOLoop.current', return_value=ioloop):
+            MM.broadcast_update_game(gm, sockets, DS.DeliveryScheduler(), mode="moderate")
+            ioloop.call_later.call_args[0][1]()
+        frames = [json.loads(frame.data) for frame in sent_frames(sockets["fuga"])]
+        self.eq(["game_update_message", "ask_message"], [frame["content"]["update_type"] for frame in frames])
+
+    def test_private_ask_gets_own_frame(self):
+        sockets = {uuid: gen_mock_socket(uuid) for uuid in ["hoge", "fuga", "spectator"]}
+        gm = setup_game_manager(["hoge", "fuga"])
+        gm.update_game("fold", 0)
+        MM.broadcast_update_game(gm, sockets, DS.DeliveryScheduler(), mode="dev")
+        frames = {uuid: sent_frames(soc) for uuid, soc in sockets.items()}
+        for uuid in ["hoge", "spectator"]:
+            self.size(1, frames[uuid])
+            self.eq("game_update_message", json.loads(frames[uuid][0].data)["content"]["update_type"])
+        # the spectators share one frame, and the asked player gets the ask along with the update
+        self.true(frames["hoge"][0] is frames["spectator"][0])
+        self.size(1, frames["fuga"])
+        self.eq(["game_update_message", "ask_message"],
+                [message["content"]["update_type"] for message in received_messages(sockets["fuga"])])
+
+    def test_join_snapshot_follows_pending_deliveries(self):
+        sockets = {uuid: gen_mock_socket(uuid) for uuid in ["hoge", "fuga"]}
+        gm = setup_game_manager(["hoge", "fuga"])
+        gm.update_game("fold", 0)
+        scheduler = DS.DeliveryScheduler()
+        ioloop = Mock()
+        with patch('tornado.ioloop.IOLoop.current', return_value=ioloop),\
+            patch('pypokergui.server.message_manager._gen_start_game_message', return_value="start_game"):
+            MM.broadcast_update_game(gm, sockets, scheduler, mode="moderate")
+            joined = gen_mock_socket("spectator")
+            MM.send_game_snapshot("handler", gm, joined, scheduler)
+            round_state = gm.latest_round_state
+            gm.update_game("call", 20)
+            sockets["spectator"] = joined
+            MM.broadcast_update_game(gm, sockets, scheduler, mode="moderate")
+            # the ask to fuga is still waiting, so the snapshot is held back
+            self.false(joined.write_message.called)
+            self.false(joined.send_frame.called)
+            while not scheduler.is_idle():
+                ioloop.call_later.call_args[0][1]()
+        self.eq("ask_message", received_messages(sockets["fuga"])[1]["content"]["update_type"])
+        messages = [call[0][0] for call in joined.write_message.call_args_list]
+        self.eq("start_game", messages[0])
+        self.eq(round_state, messages[1]["content"]["delta"])
+        self.eq("game_update_message", received_messages(joined)[0]["content"]["update_type"])
+
+    def test_broadcast_update_game_tracks_unwatched_rounds(self):
+        gm = GameManager()
+        gm.define_rule(10, 100, 10, 5, None)
+        for name in ["a", "b", "c"]:
+            gm.join_ai_player(name, ai_setup_script_path)
+        gm.start_game()
+        while gm.engine.current_state["round_count"] < 4:
+            MM.broadcast_update_game(gm, {}, DS.DeliveryScheduler(), mode="dev")
+            gm.update_game(*gm.ask_action_to_ai_player(gm.next_player_uuid))
+        MM.broadcast_update_game(gm, {}, DS.DeliveryScheduler(), mode="dev")
+        players = gm.engine.current_state["table"].seats.players
+        self.eq({p.uuid: [str(card) for card in p.hole_card] for p in players}, gm.hole_cards)
+        self.eq(4, gm.latest_round_state["round_count"])
+        self.eq([p.stack for p in players], [seat["stack"] for seat in gm.latest_round_state["seats"]])
+
     def _append_log_on_player(self, player, message):
         player.debug_message = message
 
@@ -68,6 +170,20 @@ def gen_mock_socket(uuid):
     soc.uuid = uuid
     return soc
 
+def sent_frames(soc):
+    return [call[0][0] for call in soc.send_frame.call_args_list]
+
+def received_messages(soc):
+    messages = []
+    for call in soc.send_frame.call_args_list:
+        frame = call[0][0]
+        message = json.loads(frame.data if isinstance(frame, SF.SharedFrame) else frame)
+        if isinstance(message, dict) and message.get("message_type") == "update_batch":
+            messages += message["messages"]
+        else:
+            messages.append(message)
+    return messages
+
 def setup_game_manager(uuids):
     gm = GameManager()
     gm.define_rule(10, 100, 10, 5, None)
@@ -78,7 +194,5 @@ def setup_game_manager(uuids):
     return gm
 
 def find_socket_by_uuid(sockets, uuid):
-    for soc in sockets:
-        if soc.uuid == uuid:
-            return soc
+    return sockets.get(uuid)
 
@@ -0,0 +1,54 @@
+from tests.base_unittest import BaseUnitTest
+
+import pypokergui.server.metrics as MT
+
+class MetricsTest(BaseUnitTest):
+
+    def setUp(self):
+        self.registry = MT.MetricsRegistry()
+
+    def test_histogram_buckets_are_cumulative(self):
+        histogram = self.registry.histogram("latency", "Latency", buckets=[0.1, 1])
+        for value in [0.05, 0.1, 0.5, 3]:
+            histogram.observe(value)
+        self.eq([
+            "# HELP latency Latency",
+            "# TYPE latency histogram",
+            'latency_bucket{le="0.1"} 2',
+            'latency_bucket{le="1.0"} 3',
+            'latency_bucket{le="+Inf"} 4',
+            "latency_count 4",
+            "latency_sum 3.65"
+            ], histogram.expose())
+
+    def test_histogram_per_label_values(self):
+        histogram = self.registry.histogram("decision", "Decision", ["bot"], buckets=[1])
+        histogram.observe(0.5, "fish")
+        histogram.observe(2, "honest")
+        lines = histogram.expose()
+        self.true('decision_bucket{bot="fish",le="1.0"} 1' in lines)
+        self.true('decision_bucket{bot="honest",le="1.0"} 0' in lines)
+        self.true('decision_bucket{bot="honest",le="+Inf"} 1' in lines)
+        self.true('decision_count{bot="fish"} 1' in lines)
+        self.true('decision_sum{bot="honest"} 2.0' in lines)
+
+    def test_escape_label_values(self):
+        histogram = self.registry.histogram("decision", "Decision", ["bot"], buckets=[1])
+        histogram.observe(0.5, 'a "quoted"\\bot\nname')
+        self.true('decision_count{bot="a \\"quoted\\"\\\\bot\\nname"} 1' in histogram.expose())
+
+    def test_gauge_reads_callback(self):
+        tables = []
+        self.registry.gauge("tables", "Hosted tables", lambda: len(tables))
+        tables.append("table")
+        self.eq("# HELP tables Hosted tables\n# TYPE tables gauge\ntables 1.0\n", self.registry.expose())
+        # registering again replaces the callback
+        self.registry.gauge("tables", "Hosted tables", lambda: 5)
+        self.true("tables 5.0\n" in self.registry.expose())
+
+    def test_expose_every_metric(self):
+        self.registry.histogram("latency", "Latency", buckets=[1]).observe(0.5)
+        self.registry.gauge("sockets", "Sockets", lambda: 2)
+        lines = self.registry.expose().splitlines()
+        self.eq(["latency", "sockets"], [line.split()[2] for line in lines if line.startswith("# TYPE")])
+        self.eq("sockets 2.0", lines[-1])
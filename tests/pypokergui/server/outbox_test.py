@@ -0,0 +1,92 @@
+from concurrent.futures import Future
+from mock import patch
+
+from tests.base_unittest import BaseUnitTest
+
+import pypokergui.server.outbox as OB
+
+class SpectatorOutboxTest(BaseUnitTest):
+
+    def setUp(self):
+        self.socket = FakeSocket()
+        self.outbox = OB.SpectatorOutbox(self.socket, lambda round_state: "snapshot:%s" % round_state, 100, 30)
+
+    def test_write_one_frame_at_a_time(self):
+        self.outbox.push("a" * 10)
+        self.outbox.push("b" * 10)
+        self.eq(["a" * 10], self.socket.written)
+        self.socket.resolve_next()
+        self.eq(["a" * 10, "b" * 10], self.socket.written)
+
+    def test_drop_stale_frames_and_send_one_snapshot(self):
+        self.outbox.push("a" * 10, round_state=1)
+        for round_state in range(2, 6):
+            self.outbox.push("u" * 30, round_state=round_state)
+        self.outbox.push("c" * 30, droppable=False)
+        self.outbox.push("u" * 30, round_state=6)
+        self.true(self.outbox.needs_snapshot)
+        self.not_none(self.outbox.lagging_since)
+        self.socket.resolve_all()
+        self.eq(["a" * 10, "c" * 30, "snapshot:6"], self.socket.written)
+        self.false(self.outbox.needs_snapshot)
+        self.none(self.outbox.lagging_since)
+
+    def test_keep_non_droppable_frames(self):
+        self.outbox.push("a" * 10, round_state=1)
+        for _ in range(5):
+            self.outbox.push("c" * 30, droppable=False)
+        self.false(self.outbox.needs_snapshot)
+        self.socket.resolve_all()
+        # nothing was dropped, so no snapshot follows
+        self.eq(["a" * 10] + ["c" * 30] * 5, self.socket.written)
+
+    def test_no_snapshot_without_round_state(self):
+        self.outbox.push("a" * 10)
+        for _ in range(5):
+            self.outbox.push("u" * 30)
+        self.false(self.outbox.needs_snapshot)
+        self.socket.resolve_all()
+        self.false("snapshot:None" in self.socket.written)
+
+    def test_close_socket_after_max_lag(self):
+        with patch('pypokergui.server.outbox.time') as clock:
+            clock.time.return_value = 100
+            self.outbox.push("a" * 10)
+            for _ in range(4):
+                self.outbox.push("u" * 30)
+            self.not_none(self.outbox.lagging_since)
+            clock.time.return_value = 100 + 30
+            self.outbox.push("u" * 30)
+            self.false(self.socket.closed)
+            clock.time.return_value = 100 + 31
+            self.outbox.push("u" * 30)
+        self.true(self.socket.closed)
+        self.true(self.outbox.closed)
+        self.socket.resolve_all()
+        self.eq(["a" * 10], self.socket.written)
+
+
+class FakeSocket(object):
+    """Socket whose writes complete only when the test resolves them"""
+
+    def __init__(self):
+        self.uuid = "spectator"
+        self.written = []
+        self.futures = []
+        self.closed = False
+
+    def write_message(self, frame):
+        self.written.append(frame)
+        self.futures.append(Future())
+        return self.futures[-1]
+
+    def resolve_next(self):
+        future = next(future for future in self.futures if not future.done())
+        future.set_result(None)
+
+    def resolve_all(self):
+        while any([not future.done() for future in self.futures]):
+            self.resolve_next()
+
+    def close(self):
+        self.closed = True
@@ -0,0 +1,50 @@
+import os
+import shutil
+import tempfile
+
+from tests.base_unittest import BaseUnitTest
+
+import pypokergui.server.replay as RP
+
+class ReplayTest(BaseUnitTest):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.log_path = os.path.join(self.tmp_dir, "hands.jsonl")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_index_is_extended(self):
+        write_hands(self.log_path, range(3))
+        self.eq(3, RP.HandLog(self.log_path).hand_count())
+        write_hands(self.log_path, range(3, 5))
+        hand_log = RP.HandLog(self.log_path)
+        self.eq(5, hand_log.hand_count())
+        self.eq([{ "hand": idx } for idx in range(5)], [hand_log.read_hand(idx) for idx in range(5)])
+
+    def test_index_is_rebuilt_after_rotation(self):
+        write_hands(self.log_path, range(3))
+        self.eq(3, RP.HandLog(self.log_path).hand_count())
+        os.replace(self.log_path, self.log_path + ".1")
+        # the new log grows past the size indexed for the old one
+        write_hands(self.log_path, range(100, 110), padding="x" * 10)
+        hand_log = RP.HandLog(self.log_path)
+        self.eq(10, hand_log.hand_count())
+        self.eq([100, 101, 102], [hand_log.read_hand(idx)["hand"] for idx in range(3)])
+
+    def test_partly_written_line_is_left(self):
+        write_hands(self.log_path, range(2))
+        with open(self.log_path, "a") as f: f.write('{"hand": 2')
+        self.eq(2, RP.HandLog(self.log_path).hand_count())
+        with open(self.log_path, "a") as f: f.write('}\n')
+        self.eq(3, RP.HandLog(self.log_path).hand_count())
+
+
+def write_hands(log_path, hand_ids, padding=""):
+    with open(log_path, "a") as f:
+        for hand_id in hand_ids:
+            if padding:
+                f.write('{"hand": %d, "padding": "%s"}\n' % (hand_id, padding))
+            else:
+                f.write('{"hand": %d}\n' % hand_id)
@@ -0,0 +1,88 @@
+import zlib
+import asyncio
+from mock import Mock
+from mock import patch
+
+import tornado.web
+import tornado.httpserver
+import tornado.testing
+import tornado.websocket
+
+from tests.base_unittest import BaseUnitTest
+
+import pypokergui.server.shared_frame as SF
+
+class SharedFrameTest(BaseUnitTest):
+
+    def test_deflate_drops_sync_flush_tail(self):
+        frame = SF.SharedFrame({ "message_type": "update_game", "padding": "x" * 500 })
+        payload = frame.deflate(15, 6)
+        self.false(payload.endswith(b"\x00\x00\xff\xff"))
+        decompressor = zlib.decompressobj(-15)
+        self.eq(frame.data, decompressor.decompress(payload + b"\x00\x00\xff\xff"))
+        self.true(payload is frame.deflate(15, 6))
+
+    def test_round_trip_with_deflate_client(self):
+        large = SF.SharedFrame({ "message_type": "update_game", "padding": "x" * 500 })
+        small = SF.SharedFrame({ "message_type": "ping" })
+        received, written = asyncio.run(exchange([large, small, large], 6, 256))
+        for messages in received:
+            self.eq([large.data.decode(), small.data.decode(), large.data.decode()], messages)
+        # the deflated payload is built once and the same bytes go to both clients
+        for frames in written:
+            self.eq([(large.deflate(15, 6), RSV1), (small.data, 0), (large.deflate(15, 6), RSV1)], frames)
+        self.size(1, large.deflated)
+
+    def test_compression_level_zero(self):
+        large = SF.SharedFrame({ "message_type": "update_game", "padding": "x" * 500 })
+        received, written = asyncio.run(exchange([large], 0, 256))
+        self.eq([large.data.decode()], received[0])
+        self.eq([(large.data, 0)], written[0])
+
+    def test_fall_back_without_protocol_internals(self):
+        socket = Mock()
+        socket.ws_connection = Mock(spec=["is_closing"])
+        socket.ws_connection.is_closing.return_value = False
+        frame = SF.SharedFrame("hoge")
+        with patch('tornado.websocket.WebSocketHandler.write_message') as write_message:
+            SF.write_frame(socket, frame, 6, 0)
+        write_message.assert_called_with(socket, frame.data)
+
+
+class FrameHandler(tornado.websocket.WebSocketHandler):
+
+    def get_compression_options(self):
+        if self.settings["compression_level"] == 0: return None
+        return { "compression_level": self.settings["compression_level"] }
+
+    async def open(self):
+        written = []
+        self.settings["written"].append(written)
+        write_frame = self.ws_connection._write_frame
+        def spy(fin, opcode, data, flags=0):
+            if opcode == SF.TEXT_OPCODE: written.append((data, flags))
+            return write_frame(fin, opcode, data, flags=flags)
+        self.ws_connection._write_frame = spy
+        for frame in self.settings["frames"]:
+            await SF.write_frame(self, frame,
+                    self.settings["compression_level"], self.settings["compression_min_size"])
+
+async def exchange(frames, compression_level, min_size):
+    written = []
+    app = tornado.web.Application([(r"/", FrameHandler)], frames=frames, written=written,
+            compression_level=compression_level, compression_min_size=min_size)
+    sock, port = tornado.testing.bind_unused_port()
+    server = tornado.httpserver.HTTPServer(app)
+    server.add_sockets([sock])
+    received = []
+    try:
+        for _ in range(2):
+            client = await tornado.websocket.websocket_connect(
+                    "ws://127.0.0.1:%d/" % port, compression_options={})
+            received.append([await client.read_message() for _ in frames])
+            client.close()
+    finally:
+        server.stop()
+    return received, written
+
+RSV1 = tornado.websocket.WebSocketProtocol13.RSV1
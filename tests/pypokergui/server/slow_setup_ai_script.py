@@ -0,0 +1,8 @@
+import time
+
+from tests.pypokergui.server.sample_ai_setup_script import FishPlayer
+
+
+def setup_ai():
+    time.sleep(1)
+    return FishPlayer()
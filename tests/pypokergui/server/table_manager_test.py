@@ -0,0 +1,78 @@
+from mock import Mock
+
+from tests.base_unittest import BaseUnitTest
+
+import pypokergui.server.table_manager as TM
+
+class TableRegistryTest(BaseUnitTest):
+
+    def setUp(self):
+        self.registry = TM.TableRegistry(gen_config())
+
+    def test_create_and_get_table(self):
+        first = self.registry.create_table()
+        second = self.registry.create_table()
+        self.eq(["1", "2"], [first.table_id, second.table_id])
+        self.true(first is self.registry.get_table("1"))
+        self.none(self.registry.get_table("3"))
+        self.eq([first, second], self.registry.list_tables())
+        self.false(first.game_manager is second.game_manager)
+        self.false(first.scheduler is second.scheduler)
+
+    def test_remove_table(self):
+        table = self.registry.create_table()
+        socket = gen_mock_socket("hoge")
+        table.join_socket(socket)
+        self.true(table is self.registry.remove_table("1"))
+        self.true(table.closed)
+        self.true(socket.close.called)
+        self.eq({}, table.sockets)
+        self.eq([], self.registry.list_tables())
+        self.none(self.registry.remove_table("1"))
+        # ids are not reused
+        self.eq("2", self.registry.create_table().table_id)
+
+    def test_close_table(self):
+        table = self.registry.create_table()
+        table.game_loop = Mock()
+        table.scheduler.pause()
+        table.scheduler.schedule(lambda: None, 0)
+        table.close()
+        self.true(table.game_loop.stop.called)
+        self.true(table.scheduler.is_idle())
+
+
+class PokerTableTest(BaseUnitTest):
+
+    def setUp(self):
+        self.table = TM.PokerTable("1", gen_config())
+
+    def test_join_and_leave_socket(self):
+        hoge, fuga = gen_mock_socket("hoge"), gen_mock_socket("fuga")
+        self.table.join_socket(hoge)
+        self.table.join_socket(fuga)
+        self.eq({ "hoge": hoge, "fuga": fuga }, self.table.sockets)
+        self.table.leave_socket(hoge)
+        self.table.leave_socket(hoge)
+        self.eq({ "fuga": fuga }, self.table.sockets)
+
+    def test_status(self):
+        self.eq("waiting", self.table.status())
+        self.table.game_loop = Mock()
+        self.eq("starting", self.table.status())
+
+
+def gen_config():
+    return {
+            "max_round": 10,
+            "initial_stack": 100,
+            "small_blind": 10,
+            "ante": 5,
+            "blind_structure": None,
+            "ai_players": []
+            }
+
+def gen_mock_socket(uuid):
+    socket = Mock()
+    socket.uuid = uuid
+    return socket
@@ -0,0 +1,58 @@
+import os
+import random
+
+import numpy as np
+
+from tests.base_unittest import BaseUnitTest
+
+import pypokergui.equity as EQ
+import pypokergui.simulator as S
+
+class SimulatorTest(BaseUnitTest):
+
+    def test_seed_game(self):
+        draws = []
+        for _ in range(2):
+            S.seed_game(7)
+            equity = EQ.estimate_equity(["SA", "HA"], time_budget=0, batch_size=100)
+            draws.append((random.random(), np.random.random(), equity["equity"]))
+        self.eq(draws[0], draws[1])
+
+    def test_rotations_deal_same_hole_cards_to_seat(self):
+        config = gen_config(3)
+        hole_cards = {}  # round count => hole cards by seat of each rotation
+        for rotation in range(3):
+            result = S.play_duplicate_game(config, (5, rotation), record=True)
+            for hand in result["hand_histories"]:
+                hole_cards.setdefault(hand["round_count"], []).append(hand["hole_cards"])
+        self.true(len(hole_cards) > 0)
+        for round_cards in hole_cards.values():
+            if len(round_cards) < 3: continue  # the round was not reached in every rotation
+            self.eq(round_cards[0], round_cards[1])
+            self.eq(round_cards[0], round_cards[2])
+
+    def test_entries_credit_config_entry(self):
+        config = gen_config(3)
+        for rotation in range(3):
+            result = S.play_duplicate_game(config, (5, rotation))
+            names = { uuid: name for uuid, name, _stack in result["stacks"] }
+            stacks = { uuid: stack for uuid, _name, stack in result["stacks"] }
+            self.eq([0, 1, 2], sorted([entry for entry, _stack in result["entries"]]))
+            for entry, stack in result["entries"]:
+                uuid = str((entry - rotation) % 3)
+                self.eq(config["ai_players"][entry]["name"], names[uuid])
+                self.eq(stacks[uuid], stack)
+
+
+def gen_config(num_players):
+    return {
+            "max_round": 5,
+            "initial_stack": 100,
+            "small_blind": 5,
+            "ante": 0,
+            "blind_structure": None,
+            "ai_players": [{ "name": "entry-%d" % entry, "path": ai_setup_script_path }
+                for entry in range(num_players)]
+            }
+
+ai_setup_script_path = os.path.join(os.path.dirname(__file__), "server", "sample_ai_setup_script.py")